@@ -0,0 +1,197 @@
+"""
+Пакетный анализ позиций: для каждой позиции из входного файла ищется ход стороны, которая должна ходить, и результат
+(ход, оценка, глубина, количество позиций, время) дописывается строкой JSON в выходной файл - в порядке завершения
+расчетов. Позиции распределяются между процессами (ProcessPoolExecutor), в каждом процессе - свой Ai. Каждая позиция
+ищется с новой таблицей транспозиций, поэтому результат не зависит от того, какие позиции и в каком порядке
+просчитал процесс до нее, и повторный запуск дает те же результаты, что и первый.
+Pygame не требуется.
+
+Входной файл - по одной позиции в строке: текстовая запись позиции (см. Pool.format_actions), перед которой может
+стоять идентификатор через пробел. Пустые строки и строки, начинающиеся с #, пропускаются. Позиции, для которых
+в выходном файле уже есть результат (по идентификатору, а без него - по записи позиции), не пересчитываются,
+поэтому прерванный запуск можно просто повторить с теми же параметрами.
+
+Примеры запуска:
+    python analyze.py positions.txt --output results.jsonl --depth 4
+    python analyze.py positions.txt --output results.jsonl --time 5 --workers 4
+"""
+
+import argparse
+import concurrent.futures
+import json
+import os
+import time
+from settings import CMP_SIDE, PLAYER_SIDE, SEARCH_TIME, SEARCH_MAX_DEPTH, TT_SIZE_MB
+from classes.pool import Pool
+from classes.ai import Ai
+from classes.transposition_table import TranspositionTable
+
+# Ai процесса-исполнителя и ограничения поиска
+worker_ai = None
+worker_limits = None
+
+
+def read_jobs(path):
+    """ Генератор пар (идентификатор, запись позиции) из входного файла """
+
+    with open(path) as file:
+        for line in file:
+            words = line.split()
+            if not words or words[0].startswith('#'):
+                continue
+            if len(words) == 1:
+                yield words[0], words[0]
+            else:
+                yield words[0], words[1]
+
+
+def read_done_ids(path):
+    """
+    Функция возвращает множество идентификаторов позиций, уже записанных в выходной файл. Оборванная последняя
+    строка (если запуск был прерван во время записи) удаляется из файла
+    """
+
+    done_ids = set()
+    if not os.path.exists(path):
+        return done_ids
+
+    with open(path, 'rb+') as file:
+        data = file.read()
+        if data and not data.endswith(b'\n'):
+            file.truncate(data.rfind(b'\n') + 1)
+            data = data[:data.rfind(b'\n') + 1]
+
+    for line in data.decode().splitlines():
+        if line.strip():
+            done_ids.add(json.loads(line)['id'])
+    return done_ids
+
+
+def init_worker(limits):
+    global worker_limits
+    worker_limits = limits
+
+
+def get_worker_ai():
+    """
+    Функция возвращает Ai процесса-исполнителя. Параллельный поиск (SEARCH_WORKERS) в исполнителях не используется -
+    процессы и так заняты позициями, а таблица транспозиций у каждой позиции своя
+    """
+
+    global worker_ai
+    if worker_ai is None:
+        search_time, max_depth, max_nodes = worker_limits
+        ai = Ai(Pool(), workers=1, use_book=False, use_cache=False, search_time=search_time, max_depth=max_depth)
+        if max_nodes:
+            ai.finish_check = lambda: ai.total_view_position_count >= max_nodes
+        worker_ai = ai
+    return worker_ai
+
+
+def analyze_position(position_id, notation):
+    """
+    Функция ищет ход в позиции notation и возвращает словарь с результатом. Ai всегда ищет ход компьютера, поэтому
+    за игрока поиск идет в зеркальной позиции. Таблица транспозиций для каждой позиции новая: так результат
+    не зависит от прошлых позиций процесса, а зеркальные позиции (в них очередь хода не совпадает с четностью
+    количества ходов, по которой она учитывается в хэше) не смешиваются с обычными в одной таблице
+    """
+
+    result = {'id': position_id, 'position': notation}
+    try:
+        actions = Pool.parse_actions(notation)
+        pool = Pool.from_actions(actions)
+    except ValueError as e:
+        result['error'] = str(e)
+        return result
+
+    side = PLAYER_SIDE if len(actions) % 2 == 0 else CMP_SIDE
+    result['side'] = side
+    if pool.get_winner_side():
+        result['error'] = 'партия окончена'
+        return result
+
+    mirrored = side == PLAYER_SIDE
+    ai = get_worker_ai()
+    if TT_SIZE_MB:
+        ai.tt = TranspositionTable(TT_SIZE_MB)
+    ai.pool = Pool.from_actions(actions, mirrored) if mirrored else pool
+    time_start = time.perf_counter()
+    rate_actions = ai.search(ai.pool.create_actions(CMP_SIDE))
+    rate, action = rate_actions[0]
+    if mirrored:
+        action = pool.mirror_action(action, CMP_SIDE)
+
+    result.update({
+        'move': action,
+        'score': rate,
+        'depth': ai.completed_depth + 1,
+        'nodes': ai.total_view_position_count,
+        'time': round(time.perf_counter() - time_start, 3)
+    })
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Пакетный анализ позиций')
+    parser.add_argument('input', help='файл с позициями')
+    parser.add_argument('--output', required=True, help='файл результатов в формате JSONL (дописывается)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='количество процессов')
+    parser.add_argument('--depth', type=int, help='наибольшая глубина поиска')
+    parser.add_argument('--time', type=float, help='время на позицию в секундах')
+    parser.add_argument('--nodes', type=int, help='наибольшее количество позиций на поиск')
+    args = parser.parse_args()
+    if args.depth is not None and args.depth < 1:
+        parser.error('глубина поиска должна быть не меньше 1')
+
+    # Без ограничений поиск идет как в игре - по SEARCH_TIME и SEARCH_MAX_DEPTH
+    search_time = args.time
+    if args.time is None and args.depth is None and args.nodes is None:
+        search_time = SEARCH_TIME
+    max_depth = args.depth - 1 if args.depth is not None else SEARCH_MAX_DEPTH
+    limits = (search_time, max_depth, args.nodes)
+
+    done_ids = read_done_ids(args.output)
+    skipped_count = 0
+    done_count = 0
+    error_count = 0
+    time_start = time.perf_counter()
+
+    # Позиции читаются из файла по мере освобождения процессов, поэтому размер файла не ограничен памятью
+    jobs = read_jobs(args.input)
+    executor = concurrent.futures.ProcessPoolExecutor(args.workers, initializer=init_worker, initargs=(limits,))
+    futures = set()
+    try:
+        with open(args.output, 'a') as output:
+            while True:
+                while len(futures) < args.workers * 2:
+                    job = next(jobs, None)
+                    if job is None:
+                        break
+                    if job[0] in done_ids:
+                        skipped_count += 1
+                        continue
+                    done_ids.add(job[0])
+                    futures.add(executor.submit(analyze_position, *job))
+                if not futures:
+                    break
+
+                finished, futures = concurrent.futures.wait(futures, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in finished:
+                    result = future.result()
+                    output.write(json.dumps(result) + '\n')
+                    output.flush()
+                    done_count += 1
+                    if 'error' in result:
+                        error_count += 1
+    finally:
+        for future in futures:
+            future.cancel()
+        executor.shutdown()
+
+    print('Посчитано позиций: {} (с ошибками: {}), пропущено уже посчитанных: {}, время: {:.1f} с'.format(
+        done_count, error_count, skipped_count, time.perf_counter() - time_start
+    ))
+
+
+if __name__ == '__main__':
+    main()
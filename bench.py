@@ -0,0 +1,259 @@
+"""
+Микробенчмарки основных операций пула (генерация ходов, применение и откат хода, оценка позиции,
+сохранение и восстановление состояния) на фиксированном наборе позиций. Pygame не требуется.
+С флагом --search дополнительно выполняется поиск хода компьютера на фиксированную глубину в каждой позиции набора:
+выводится суммарное количество просмотренных позиций и время поиска. С флагом --workers поиск параллельный
+(см. SEARCH_WORKERS): позиции считаются только в основном процессе, поэтому ускорение видно по времени поиска.
+С флагом --games набор позиций берется из файла записей партий (см. GameRecords), а дополнительно замеряется
+скорость воспроизведения всех партий файла.
+
+Примеры запуска:
+    python bench.py --output bench_base.json
+    python bench.py --compare bench_base.json --threshold 10
+    python bench.py --search 3
+    python bench.py --search 4 --workers 4
+    python bench.py --games games.bin
+"""
+
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+from settings import PLAYER_SIDE, CMP_SIDE, TT_SIZE_MB
+from classes.pool import Pool
+from classes.ai import Ai
+from classes.game_records import GameRecords
+from classes.search_helpers import SearchHelpers
+
+# Набор позиций: партии со случайными ходами, прерванные после заданного количества ходов
+CORPUS_SEEDS = range(8)
+CORPUS_LENGTHS = [0, 10, 20, 30, 40, 50]
+
+
+def create_corpus(games_path=None):
+    """
+    Функция возвращает список пар (пул, сторона, которая должна ходить). Если задан файл записей партий games_path,
+    то позиции берутся из первых len(CORPUS_SEEDS) партий файла, а не из партий со случайными ходами
+    """
+
+    if games_path:
+        return create_games_corpus(games_path)
+
+    result = []
+    for seed in CORPUS_SEEDS:
+        generator = random.Random(seed)
+        for length in CORPUS_LENGTHS:
+            pool = Pool()
+            side = PLAYER_SIDE
+            for _ in range(length):
+                # Ходы упорядочиваются по их записи, чтобы набор позиций не зависел от порядка генерации ходов
+                actions = sorted(pool.create_actions(side), key=lambda x: str(Pool.decode_action(x)))
+                pool.apply_action(generator.choice(actions))
+                side = Pool.OTHER_SIDE_DICT[side]
+                if pool.get_winner_side():
+                    break
+            result.append((pool, side))
+    return result
+
+
+def create_games_corpus(games_path):
+    result = []
+    for game_number, (moves, _) in enumerate(GameRecords.read(games_path)):
+        if game_number == len(CORPUS_SEEDS):
+            break
+        for length in CORPUS_LENGTHS:
+            if length > len(moves):
+                break
+            pool = Pool.from_actions(moves[:length])
+            result.append((pool, PLAYER_SIDE if length % 2 == 0 else CMP_SIDE))
+    return result
+
+
+def run_replay(games_path):
+    """ Функция возвращает словарь с количеством ходов во всех партиях файла и временем их чтения и воспроизведения """
+
+    time_start = time.perf_counter()
+    moves_count = sum(len(moves) for moves, _ in GameRecords.read(games_path))
+    read_time = time.perf_counter() - time_start
+
+    time_start = time.perf_counter()
+    for _ in GameRecords.replay(games_path):
+        pass
+    replay_time = time.perf_counter() - time_start
+
+    return {'moves_count': moves_count, 'read_time': round(read_time, 3), 'replay_time': round(replay_time, 3)}
+
+
+def bench_create_actions(corpus):
+    count = 0
+    for pool, side in corpus:
+        pool.create_actions(side)
+        count += 1
+    return count
+
+
+def bench_apply_cancel(corpus):
+    count = 0
+    for pool, side in corpus:
+        for action in pool.create_actions(side):
+            pool.apply_action(action)
+            pool.cancel_action()
+            count += 1
+    return count
+
+
+def bench_get_rating(corpus):
+    count = 0
+    for pool, _ in corpus:
+        for _ in range(500):
+            pool.get_rating()
+            count += 1
+    return count
+
+
+def bench_backup_restore(corpus):
+    count = 0
+    for pool, _ in corpus:
+        pool.backup_state()
+        pool.restore_state()
+        count += 1
+    return count
+
+
+BENCHMARKS = {
+    'create_actions': bench_create_actions,
+    'apply_cancel': bench_apply_cancel,
+    'get_rating': bench_get_rating,
+    'backup_restore': bench_backup_restore
+}
+
+
+def run(repeat, games_path=None):
+    """ Функция возвращает словарь {название операции: лучшее время одного вызова в микросекундах} """
+
+    corpus = create_corpus(games_path)
+    result = {}
+    for name, function in BENCHMARKS.items():
+        best = None
+        for _ in range(repeat):
+            time_start = time.perf_counter()
+            count = function(corpus)
+            mcs = (time.perf_counter() - time_start) * 1000000 / count
+            if best is None or mcs < best:
+                best = mcs
+        result[name] = round(best, 3)
+    return result
+
+
+def run_search(depth, games_path=None, workers=1):
+    """
+    Функция возвращает словарь с количеством позиций, просмотренных при поиске, и временем поиска в секундах.
+    При workers > 1 поиску помогают workers - 1 вспомогательных процессов - одни и те же для всех позиций
+    """
+
+    helpers = SearchHelpers(workers - 1) if workers > 1 else None
+    view_position_count = 0
+    time_passed = 0
+    for pool, side in create_corpus(games_path):
+        # Поиск всегда ищет ход компьютера, поэтому в позициях, где очередь игрока, он сначала делает свой ход
+        if side == PLAYER_SIDE:
+            actions = sorted(pool.create_actions(side), key=lambda x: str(Pool.decode_action(x)))
+            pool.apply_action(actions[0])
+        if pool.get_winner_side():
+            continue
+
+        # Для каждой позиции - свежая таблица транспозиций, чтобы результаты не зависели от порядка позиций
+        if helpers:
+            helpers.tt.clear()
+        ai = Ai(pool, tt=helpers.tt if helpers else None, workers=1, use_book=False, use_cache=False, search_time=None,
+                max_depth=depth - 1)
+        ai.helpers = helpers
+
+        time_start = time.perf_counter()
+        ai.search(pool.create_actions(CMP_SIDE))
+        time_passed += time.perf_counter() - time_start
+        view_position_count += ai.total_view_position_count
+        ai.helpers = None
+        ai.close()
+
+    if helpers:
+        helpers.close()
+    return {'view_position_count': view_position_count, 'time': round(time_passed, 3)}
+
+
+def compare(results, baseline, threshold):
+    """ Функция выводит сравнение с базовыми результатами и возвращает список операций, замедлившихся сильнее порога """
+
+    regressions = []
+    for name, mcs in results.items():
+        base_mcs = baseline.get(name)
+        if not base_mcs:
+            print(f'{name:>16}: {mcs:>10.3f} мкс (нет в базовых результатах)')
+            continue
+        change = (mcs - base_mcs) / base_mcs * 100
+        mark = ''
+        if change > threshold:
+            mark = ' ЗАМЕДЛЕНИЕ'
+            regressions.append(name)
+        print(f'{name:>16}: {base_mcs:>10.3f} -> {mcs:>10.3f} мкс ({change:+.1f}%){mark}')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Микробенчмарки операций пула')
+    parser.add_argument('--output', help='файл для сохранения результатов в формате JSON')
+    parser.add_argument('--compare', help='файл с базовыми результатами для сравнения')
+    parser.add_argument('--threshold', type=float, default=10, help='допустимое замедление в процентах')
+    parser.add_argument('--repeat', type=int, default=9, help='количество повторов каждого замера')
+    parser.add_argument('--search', type=int, help='глубина поиска хода в каждой позиции набора (в полуходах)')
+    parser.add_argument('--workers', type=int, default=1, help='количество процессов поиска с флагом --search')
+    parser.add_argument('--games', help='файл записей партий, из которого берется набор позиций')
+    args = parser.parse_args()
+    if args.search is not None and args.search < 1:
+        parser.error('глубина поиска должна быть не меньше 1')
+    if args.workers < 1 or args.workers > 1 and not TT_SIZE_MB:
+        parser.error('количество процессов должно быть не меньше 1, а для нескольких нужен TT_SIZE_MB больше 0')
+
+    results = run(args.repeat, args.games)
+    replay_results = None
+    if args.games:
+        replay_results = run_replay(args.games)
+        moves_count = replay_results['moves_count']
+        print(
+            f'партии из {args.games}: ходов {moves_count}, '
+            f'чтение {moves_count / max(replay_results["read_time"], 0.001):.0f} ходов/с, '
+            f'воспроизведение {moves_count / max(replay_results["replay_time"], 0.001):.0f} ходов/с'
+        )
+    search_results = None
+    if args.search is not None:
+        search_results = run_search(args.search, args.games, args.workers)
+        print(
+            f'поиск на глубину {args.search} (процессов {args.workers}): '
+            f'просмотрено позиций {search_results["view_position_count"]}, '
+            f'время {search_results["time"]} с'
+        )
+    if args.output:
+        data = {'python': platform.python_version(), 'results': results}
+        if search_results:
+            data['search'] = dict(search_results, depth=args.search, workers=args.workers)
+        if replay_results:
+            data['replay'] = replay_results
+        with open(args.output, 'w') as file:
+            json.dump(data, file, indent=4)
+
+    if not args.compare:
+        for name, mcs in results.items():
+            print(f'{name:>16}: {mcs:>10.3f} мкс')
+        return
+
+    with open(args.compare) as file:
+        baseline = json.load(file)['results']
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
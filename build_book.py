@@ -0,0 +1,79 @@
+"""
+Построение дебютной книги. Движок с фиксированной глубиной поиска отвечает на каждый возможный ход игрока
+(игрок ходит первым) на протяжении заданного количества своих первых ходов. Для каждой позиции в книгу записывается
+один ход движка с наилучшей оценкой (из равноценных ходов он выбирается случайно, но с фиксированным зерном, поэтому
+книга строится одинаково). Хранить все равноценные ходы нет смысла: в основном это симметричные друг другу ходы,
+а книга с ними получается в несколько раз больше. Pygame не требуется.
+
+Примеры запуска:
+    python build_book.py
+    python build_book.py --moves 1 --depth 5 --output opening_book.bin
+"""
+
+import argparse
+import random
+import time
+from settings import CMP_SIDE, PLAYER_SIDE, OPENING_BOOK_FILE, TT_SIZE_MB
+from classes.pool import Pool
+from classes.ai import Ai
+from classes.opening_book import OpeningBook
+from classes.transposition_table import TranspositionTable
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Построение дебютной книги')
+    parser.add_argument('--moves', type=int, default=2, help='количество первых ходов компьютера, покрываемых книгой')
+    parser.add_argument('--depth', type=int, default=4, help='глубина поиска в полуходах')
+    parser.add_argument('--seed', type=int, default=0, help='зерно для выбора из равноценных ходов')
+    parser.add_argument('--output', default=OPENING_BOOK_FILE, help='файл книги')
+    args = parser.parse_args()
+    if args.depth < 1:
+        parser.error('глубина поиска должна быть не меньше 1')
+
+    ai = Ai(Pool(), tt=TranspositionTable(TT_SIZE_MB or 16), use_book=False, use_cache=False, search_time=None,
+            max_depth=args.depth - 1)
+
+    generator = random.Random(args.seed)
+    records = []
+    time_start = time.perf_counter()
+
+    # Позиции, в которых ходит игрок, задаются списками сделанных ходов. Позиции, в которые можно прийти
+    # разными путями, рассматриваются один раз
+    player_positions = [[]]
+    for move_number in range(1, args.moves + 1):
+        cmp_positions = {}
+        for actions in player_positions:
+            pool = Pool()
+            for action in actions:
+                pool.apply_action(action)
+            for action in pool.create_actions(PLAYER_SIDE):
+                pool.apply_action(action)
+                if not pool.get_winner_side():
+                    cmp_positions.setdefault(pool.hash, actions + [action])
+                pool.cancel_action()
+
+        player_positions = []
+        for index, actions in enumerate(cmp_positions.values(), 1):
+            pool = Pool()
+            for action in actions:
+                pool.apply_action(action)
+            ai.pool = pool
+            rate_actions = ai.search(pool.create_actions(CMP_SIDE))
+            best_actions = [action for rate, action in rate_actions if rate == rate_actions[0][0]]
+            action = generator.choice(best_actions)
+
+            pool.apply_action(action)
+            records.append((pool.hash_stack[-1], pool.hash))
+            player_positions.append(actions + [action])
+            pool.cancel_action()
+
+            if index % 100 == 0 or index == len(cmp_positions):
+                print(f'Ход {move_number}: позиций {index} из {len(cmp_positions)} записей {len(records)} '
+                      f'время {time.perf_counter() - time_start:.0f} с')
+
+    OpeningBook.write(args.output, records)
+    print(f'Книга записана в {args.output}: {len(set(records))} записей')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,144 +1,496 @@
+import cProfile
+import json
 import random
-from settings import CMP_SIDE, PLAYER_SIDE, LOW_DEPTH, MID_DEPTH, DEEP_DEPTH, DEBUG
-from datetime import datetime
+from settings import CMP_SIDE, PLAYER_SIDE, SEARCH_TIME, SEARCH_MAX_DEPTH, DEBUG, TT_SIZE_MB, SEARCH_WORKERS, \
+    BATCH_LEAF_RATING, OPENING_BOOK_FILE, SEARCH_CACHE_FILE, SEARCH_CACHE_SIZE_KB, SEARCH_CACHE_MIN_DEPTH, \
+    SEARCH_STATS_FILE, SEARCH_PROFILE_FILE
+from datetime import datetime, timedelta
+from time import perf_counter
+from .transposition_table import TranspositionTable
+from .search_helpers import SearchHelpers
+from .opening_book import OpeningBook
+from .search_cache import SearchCache
+from .search_stats import SearchStats
+from .paths import get_game_path
+
+# Пакетная оценка листьев требует numpy. Без него листья оцениваются по одному
+try:
+    from .leaf_rating import LeafRating
+except ImportError:
+    LeafRating = None
 
 
 class Ai:
-    TOTAL_VIEW_LIMIT = 500000
+    # Через каждые CURRENT_COUNT_LIMIT оцененных позиций проверяется, не пора ли прервать поиск
     CURRENT_COUNT_LIMIT = 200
 
-    def __init__(self, pool):
+    def __init__(self, pool, tt=None, helper_index=0, workers=SEARCH_WORKERS, use_book=True, use_cache=True,
+                 search_time=SEARCH_TIME, max_depth=SEARCH_MAX_DEPTH):
         self.pool = pool
         self.total_view_position_count = 0
         self.current_count = 0
 
-    def action_generator(self):
+        # Ограничения поиска: время в секундах (None - без ограничения) и максимальная глубина
+        self.search_time = search_time
+        self.max_depth = max_depth
+
+        # Время окончания поиска, функция проверки внешнего сигнала остановки, глубина последней завершенной итерации,
+        # флаг прерывания текущей итерации и флаг отмены всего поиска
+        self.deadline = None
+        self.stop_check = None
+        self.completed_depth = None
+        self.stop_flag = False
+        self.cancel_flag = False
+
+        # Необязательные функции для внешних программ (см. engine.py): проверка сигнала завершения поиска (в отличие
+        # от stop_check поиск не отменяется, а ход выбирается по последней завершенной итерации) и функция, которая
+        # вызывается после каждой завершенной итерации с ее глубиной (считая с 1) и списком пар (оценка, ход)
+        self.finish_check = None
+        self.iteration_callback = None
+
+        # Таблица транспозиций сохраняется между поисками: позиции, оцененные при расчете прошлого хода,
+        # часто встречаются и при расчете следующего. При параллельном поиске таблица находится в разделяемой памяти
+        # и заполняется также вспомогательными процессами (helper_index - номер такого процесса, 0 - основной,
+        # workers - количество процессов поиска вместе с основным)
+        self.helper_index = helper_index
+        self.helpers = None
+        if tt is None and TT_SIZE_MB and workers > 1:
+            self.helpers = SearchHelpers(workers - 1)
+            tt = self.helpers.tt
+        if tt is None and TT_SIZE_MB:
+            tt = TranspositionTable(TT_SIZE_MB)
+        self.tt = tt
+
+        # Данные для упорядочивания ходов: ходы-убийцы (два последних хода, вызвавших отсечение на каждом уровне
+        # дерева перебора) и таблица истории (суммарная ценность отсечений, вызванных каждым ходом каждой стороны)
+        self.search_depth = 0
+        self.killers = []
+        self.history = {}
+
+        # Позиции на последнем уровне перебора оцениваются сразу для всех ходов узла
+        self.leaf_rating = LeafRating() if LeafRating and BATCH_LEAF_RATING else None
+
+        # Дебютная книга (вспомогательным процессам параллельного поиска и внешним программам, которым нужен
+        # именно поиск, она не нужна)
+        self.book = None
+        if OPENING_BOOK_FILE and use_book and not helper_index:
+            self.book = OpeningBook(OPENING_BOOK_FILE)
+
+        # Кэш результатов поиска, сохраняемый между запусками игры
+        self.cache = None
+        if SEARCH_CACHE_FILE and use_cache and not helper_index:
+            self.cache = SearchCache(SEARCH_CACHE_FILE, SEARCH_CACHE_SIZE_KB)
+
+        # Статистика последнего поиска (см. SearchStats), файл, в который она дописывается после каждого поиска
+        # (формат JSONL), и файл профиля: если он задан, то следующий поиск выполняется под cProfile
+        self.stats = None
+        self.stats_file = SEARCH_STATS_FILE if not helper_index else ''
+        self.profile_file = SEARCH_PROFILE_FILE if not helper_index else ''
+
+    def find_action(self, stop_check=None):
+        """
+        Метод ищет ход компьютера в текущей позиции пула. Функция stop_check (если передана) периодически
+        вызывается во время поиска - если она вернет True, то поиск прерывается и метод возвращает None
+        """
+
         actions = self.pool.create_actions(CMP_SIDE)
 
-        # Свой первый ход компьютер выбирает случайным образом
+        # Если позиция есть в дебютной книге - ход делается сразу, без поиска
+        if self.book:
+            action = self.book.find_action(self.pool, actions)
+            if action:
+                return action
+
+        # Свой первый ход (если его нет в книге) компьютер выбирает случайным образом
         if len(self.pool.actions) == 1:
-            yield random.choice(actions)
+            return random.choice(actions)
+
+        # Если позиция уже была просчитана достаточно глубоко в прошлых партиях - ход берется из кэша
+        # (запись годится, только если просчет не переходит через смену этапа партии - см. Pool.get_phase_depth)
+        phase_depth = self.pool.get_phase_depth()
+        cache_entry = self.cache.get(self.pool.hash) if self.cache else None
+        if cache_entry and cache_entry[1] > phase_depth:
+            cache_entry = None
+        if cache_entry and cache_entry[1] >= SEARCH_CACHE_MIN_DEPTH:
+            action = self._get_cache_action(actions, cache_entry)
+            if action:
+                return action
+
+        rate_actions = self.search(actions, stop_check)
+        if rate_actions is None:
+            return None
+
+        rate_actions = list(filter(lambda x: x[0] == rate_actions[0][0], rate_actions))
+        rate, action = random.choice(rate_actions)
+        if not self.cache:
+            return action
+
+        # Результат более глубокого прошлого поиска точнее текущего, иначе текущий результат сохраняется в кэше
+        depth = self.completed_depth + 1
+        if cache_entry and cache_entry[1] > depth:
+            return self._get_cache_action(actions, cache_entry) or action
+        if depth > phase_depth:
+            return action
 
-        # Обнуляем счетчик просмотра позиций и фиксируем время
+        self.pool.apply_action(action)
+        next_hash = self.pool.hash
+        self.pool.cancel_action()
+        self.cache.put(self.pool.hash, rate, depth, TranspositionTable.EXACT, next_hash)
+        self.cache.save()
+        return action
+
+    def _get_cache_action(self, actions, cache_entry):
+        # Ход ищется по хэшу позиции, которая после него получается
+        rate, depth, flag, next_hash = cache_entry
+        if flag != TranspositionTable.EXACT:
+            return None
+
+        pool = self.pool
+        for action in actions:
+            pool.apply_action(action)
+            is_found = pool.hash == next_hash
+            pool.cancel_action()
+            if is_found:
+                return action
+        return None
+
+    def search(self, actions, stop_check=None):
+        """
+        Метод оценивает ходы компьютера actions в текущей позиции пула итеративным углублением и возвращает список пар
+        (оценка, ход), отсортированный по убыванию оценки, или None, если поиск был отменен функцией stop_check
+        """
+
+        # Профилируется только один поиск - файл профиля сбрасывается сразу
+        if self.profile_file:
+            profile_file, self.profile_file = get_game_path(self.profile_file), ''
+            profiler = cProfile.Profile()
+            result = profiler.runcall(self.search, actions, stop_check)
+            profiler.dump_stats(profile_file)
+            return result
+
+        # Обнуляем счетчик просмотра позиций и статистику и фиксируем время
         self.total_view_position_count = 0
         self.current_count = 0
+        self.stats = SearchStats(self.max_depth)
+        if self.tt and not self.helper_index:
+            self.tt.new_search()
+        if self.helpers:
+            self.helpers.start(self.pool.actions, self.max_depth)
         time_start = datetime.now()
+        self.deadline = None
+        if self.search_time is not None:
+            self.deadline = time_start + timedelta(seconds=self.search_time)
+        self.stop_check = stop_check
+        self.completed_depth = None
+        self.stop_flag = False
+        self.cancel_flag = False
+        self.killers = [[None, None] for _ in range(self.max_depth + 1)]
+        self.history = {CMP_SIDE: {}, PLAYER_SIDE: {}}
 
-        # В зависимости от количества ходов в партии выбираем глубину просчета
-        depth = DEEP_DEPTH
-        actions_count = len(self.pool.actions)
-        if actions_count <= 5:
-            depth = LOW_DEPTH
-        if 6 <= actions_count <= 17:
-            depth = MID_DEPTH
-
-        rate_actions = []
-        alpha = -self.pool.MAX_RATE
-        beta = self.pool.MAX_RATE
-        for action in actions:
-            rate_generator = self.rate(action, CMP_SIDE, alpha, beta, depth)
-            while True:
-                rate = next(rate_generator)
-                if rate is None:
-                    yield None
-                    continue
+        # Вспомогательные процессы параллельного поиска перебирают ходы в другом порядке, а половина из них
+        # начинает сразу со второй итерации - так процессы меньше повторяют работу друг друга
+        rate_actions = [(0, action) for action in actions]
+        first_depth = 0
+        if self.helper_index:
+            random.Random(self.helper_index).shuffle(rate_actions)
+            first_depth = self.helper_index % 2
+
+        # Итеративное углубление: просчитываем ходы на глубину 1, 2, 3... пока не истечет отведенное время.
+        # Каждая следующая итерация перебирает ходы в порядке оценок, полученных на предыдущей
+        stats = self.stats
+        root_times = stats.root_times
+        for depth in range(first_depth, self.max_depth + 1):
+            iteration_rate_actions = []
+            iteration_start_count = self.total_view_position_count
+            alpha = -self.pool.MAX_RATE
+            beta = self.pool.MAX_RATE
+            self.search_depth = depth
+
+            # На первой итерации оцениваются все ходы без отсечений - это делается одним пакетом
+            if depth == 0 and self.leaf_rating:
+                root_actions = [action for _, action in rate_actions]
+                eval_start = perf_counter()
+                rates = self.leaf_rating.rate_actions(self.pool, root_actions).tolist()
+                stats.eval_time += perf_counter() - eval_start
+                self.total_view_position_count += len(rates)
+                iteration_rate_actions = list(zip(rates, root_actions))
+                alpha = max(rates)
+                rate_actions = []
+
+            for _, action in rate_actions:
+                action_start = perf_counter()
+                rate = self.rate(action, CMP_SIDE, alpha, beta, depth)
+                root_times[action] = root_times.get(action, 0) + perf_counter() - action_start
+                if self.stop_flag:
+                    break
+                if rate > alpha:
+                    alpha = rate
+                iteration_rate_actions.append((rate, action))
+                # Если какой-то ход дает победу - сразу же останавливаем поиски
+                if rate == self.pool.MAX_RATE:
+                    break
+
+            # Результаты прерванной итерации неполны - ход выбирается по предыдущей
+            if self.stop_flag:
+                break
+            iteration_rate_actions.sort(key=lambda x: x[0], reverse=True)
+            rate_actions = iteration_rate_actions
+            self.completed_depth = depth
+            stats.iteration_counts.append(self.total_view_position_count - iteration_start_count)
+            if self.iteration_callback:
+                self.iteration_callback(depth + 1, rate_actions)
+
+            # Если исход партии уже ясен или следующая итерация заведомо не успеет завершиться - заканчиваем поиск
+            if abs(alpha) == self.pool.MAX_RATE:
+                break
+            if self.finish_check and self.finish_check():
                 break
-            if rate > alpha:
-                alpha = rate
-            rate_actions.append((rate, action))
-            # Если какой-то ход дает победу - сразу же останавливаем поиски
-            if rate == self.pool.MAX_RATE:
+            if self.deadline and (datetime.now() - time_start) * 2 > self.deadline - time_start:
                 break
 
-        rate_actions = list(filter(lambda x: x[0] == alpha, rate_actions))
-        rate_action = random.choice(rate_actions)
+        if self.helpers:
+            self.helpers.stop()
+        if self.cancel_flag:
+            return None
+
+        time_passed = datetime.now() - time_start
+        stats.depth = self.completed_depth + 1
+        stats.time = time_passed.total_seconds()
+        stats.view_position_count = self.total_view_position_count
+        if self.tt:
+            stats.tt_probe_count = self.tt.probe_count
+            stats.tt_hit_count = self.tt.hit_count
+        if self.stats_file:
+            with open(get_game_path(self.stats_file), 'a') as file:
+                file.write(json.dumps(stats.to_dict()) + '\n')
 
         # Выводим статистику работы
-        if DEBUG:
-            time_end = datetime.now()
-            time_passed = time_end - time_start
-            total_mcs = time_passed.microseconds + time_passed.seconds * 1000000
-            msg = 'Просмотрено позиций: {count:>6} время: {time_passed:>15} мкс/позицию: {mcs}'.format(
-                count=self.total_view_position_count,
+        if DEBUG and not self.helper_index:
+            msg = 'Глубина: {depth} просмотрено позиций: {count:>6} время: {time_passed:>15} мкс/позицию: {mcs}'.format(
+                depth=stats.depth,
+                count=stats.view_position_count,
                 time_passed=str(time_passed),
-                mcs=round(total_mcs / self.total_view_position_count, 2)
+                mcs=round(stats.mcs_per_position, 2)
             )
+            if self.tt:
+                msg += ' попаданий в таблицу транспозиций: {hit_rate}% отсечений по таблице: {cut_count}'.format(
+                    hit_rate=round(self.tt.hit_rate * 100, 1),
+                    cut_count=stats.tt_cut_count
+                )
             print(msg)
 
-        yield rate_action[1]
+        return rate_actions
+
+    def close(self):
+        if self.cache:
+            self.cache.close()
+        if self.helpers:
+            self.helpers.close()
+            self.helpers = None
 
     def rate(self, action, up_side, alpha, beta, d):
+        pool = self.pool
+        stats = self.stats
+        stats.ply_counts[self.search_depth - d] += 1
+        pool.apply_action(action)
+
         # Если достигнута максимальная глубина перебора
         if d == 0:
-            self.pool.apply_action(action)
-            rate = self.pool.get_rating()
+            eval_start = perf_counter()
+            rate = pool.get_rating()
+            stats.eval_time += perf_counter() - eval_start
+            self.total_view_position_count += 1
+            self.current_count += 1
+            pool.cancel_action()
+            return rate
+
+        # Если в результате применения хода сходившая сторона победила, то дальнейший просмотр ходов не имеет смысла
+        # В такой ситуации сразу же присваиваем ходу наивысший (для компьютера) или самый низкий (для игрока) рейтинг
+        winner = pool.get_winner_side()
+        if winner == up_side:
             self.total_view_position_count += 1
             self.current_count += 1
-            self.pool.cancel_action()
-            yield rate
+            pool.cancel_action()
+            return pool.MAX_RATE if winner == CMP_SIDE else (-1) * pool.MAX_RATE
+
+        # Если позиция уже оценивалась на достаточную глубину (возможно, при другом порядке ходов),
+        # то используем сохраненную оценку. Иначе сохраненный лучший ход будет просмотрен первым. Оценки в таблице
+        # получены без смены этапа партии внутри перебора (см. _save_rate), поэтому годятся они, только если
+        # и текущий перебор до смены этапа не доходит
+        tt = self.tt
+        best_action = None
+        if tt:
+            entry = tt.get(pool.hash)
+            if entry:
+                rate, depth, flag, best_action = entry
+                if depth >= d and d <= pool.get_phase_depth() and (
+                        flag == tt.EXACT or (flag == tt.LOWER and rate > beta) or (flag == tt.UPPER and rate < alpha)
+                ):
+                    stats.tt_cut_count += 1
+                    pool.cancel_action()
+                    return rate
 
         if up_side == CMP_SIDE:
-            self.pool.apply_action(action)
-
-            # Если в результате применения хода победил компьютер, то дальнейший просмотр ходов не имеет смысла
-            # В такой ситуации сразу же присваиваем ходу наивысший рейтинг и возвращаем его
-            winner = self.pool.get_winner_side()
-            if winner == CMP_SIDE:
-                self.total_view_position_count += 1
-                self.current_count += 1
-                self.pool.cancel_action()
-                yield self.pool.MAX_RATE
-
-            actions = self.pool.create_actions(PLAYER_SIDE)
-            min_rate = self.pool.MAX_RATE * 1000
-            for _action in actions:
-                rate_generator = self.rate(_action, PLAYER_SIDE, alpha, min_rate, d - 1)
-                rate = None
-                while rate is None:
-                    rate = next(rate_generator)
-                    if rate is None:
-                        yield None
-                if self.current_count == self.CURRENT_COUNT_LIMIT:
-                    yield None
+            if d == 1 and self.leaf_rating and alpha <= -pool.MAX_RATE:
+                movegen_start = perf_counter()
+                actions = pool.create_actions(PLAYER_SIDE)
+                stats.movegen_time += perf_counter() - movegen_start
+                if actions:
+                    min_rate, best_action = self._rate_leaves(actions, PLAYER_SIDE)
+                    self._save_rate(min_rate, alpha, beta, d, best_action)
+                    pool.cancel_action()
+                    return min_rate
+
+            min_rate = pool.MAX_RATE * 1000
+            for number, action in enumerate(self._order_actions(PLAYER_SIDE, best_action, d)):
+                rate = self.rate(action, PLAYER_SIDE, alpha, min(beta, min_rate), d - 1)
+                if self.current_count >= self.CURRENT_COUNT_LIMIT:
                     self.current_count = 0
+                    self._check_time()
 
                 if rate < min_rate:
                     min_rate = rate
-                if not (alpha <= min_rate <= beta) or self.total_view_position_count > self.TOTAL_VIEW_LIMIT:
+                    best_action = action
+                if min_rate < alpha:
+                    self._save_cutoff(action, PLAYER_SIDE, d, number)
+                    break
+                if self.stop_flag:
                     break
 
-            self.pool.cancel_action()
-            yield min_rate
-
-        if up_side == PLAYER_SIDE:
-            self.pool.apply_action(action)
-
-            # Если в результате применения хода победил игрок, то дальнейший просмотр ходов не имеет смысла
-            # В такой ситуации сразу же присваиваем ходу самый низкий рейтинг и возвращаем его
-            winner = self.pool.get_winner_side()
-            if winner == PLAYER_SIDE:
-                self.total_view_position_count += 1
-                self.current_count += 1
-                self.pool.cancel_action()
-                yield (-1) * self.pool.MAX_RATE
-
-            actions = self.pool.create_actions(CMP_SIDE)
-            max_rate = (-1) * self.pool.MAX_RATE * 1000
-            for _action in actions:
-                rate_generator = self.rate(_action, CMP_SIDE, max_rate, beta, d - 1)
-                rate = None
-                while rate is None:
-                    rate = next(rate_generator)
-                    if rate is None:
-                        yield None
-                if self.current_count == self.CURRENT_COUNT_LIMIT:
-                    yield None
-                    self.current_count = 0
+            self._save_rate(min_rate, alpha, beta, d, best_action)
+            pool.cancel_action()
+            return min_rate
 
-                if rate > max_rate:
-                    max_rate = rate
-                if not (alpha <= max_rate <= beta) or self.total_view_position_count > self.TOTAL_VIEW_LIMIT:
-                    break
+        if d == 1 and self.leaf_rating and beta >= pool.MAX_RATE:
+            movegen_start = perf_counter()
+            actions = pool.create_actions(CMP_SIDE)
+            stats.movegen_time += perf_counter() - movegen_start
+            if actions:
+                max_rate, best_action = self._rate_leaves(actions, CMP_SIDE)
+                self._save_rate(max_rate, alpha, beta, d, best_action)
+                pool.cancel_action()
+                return max_rate
+
+        max_rate = (-1) * pool.MAX_RATE * 1000
+        for number, action in enumerate(self._order_actions(CMP_SIDE, best_action, d)):
+            rate = self.rate(action, CMP_SIDE, max(alpha, max_rate), beta, d - 1)
+            if self.current_count >= self.CURRENT_COUNT_LIMIT:
+                self.current_count = 0
+                self._check_time()
+
+            if rate > max_rate:
+                max_rate = rate
+                best_action = action
+            if max_rate > beta:
+                self._save_cutoff(action, CMP_SIDE, d, number)
+                break
+            if self.stop_flag:
+                break
+
+        self._save_rate(max_rate, alpha, beta, d, best_action)
+        pool.cancel_action()
+        return max_rate
+
+    def _rate_leaves(self, actions, side):
+        """
+        Метод оценивает все позиции после ходов actions одним пакетом и возвращает лучшую для стороны side оценку
+        и ход, который к ней приводит. Вызывается только в узлах, где отсечение невозможно (граница окна
+        бесконечна) и по одному пришлось бы оценить все ходы. В остальных узлах последнего уровня отсечение обычно
+        происходит после нескольких первых ходов, и пакетная оценка всех ходов обходится дороже
+        """
+
+        eval_start = perf_counter()
+        rates = self.leaf_rating.rate_actions(self.pool, actions)
+        self.stats.eval_time += perf_counter() - eval_start
+        self.total_view_position_count += len(actions)
+        self.current_count += len(actions)
+        best_index = int(rates.argmax() if side == CMP_SIDE else rates.argmin())
+
+        if self.current_count >= self.CURRENT_COUNT_LIMIT:
+            self.current_count = 0
+            self._check_time()
+        return int(rates[best_index]), actions[best_index]
+
+    def _order_actions(self, side, best_action, d):
+        """
+        Генератор ходов стороны side в порядке перебора. Ходы формируются по этапам (см. Pool.create_action_stages),
+        и если после первых ходов произошло отсечение, то следующие этапы не формируются вовсе. Порядок такой:
+        лучший ход из таблицы транспозиций, выталкивающие ходы, ходы-убийцы этого уровня (их возможность проверяется
+        без формирования списка ходов), затем ходы остальных этапов - внутри этапа по убыванию ценности в таблице
+        истории. Ходы с одинаковым приоритетом остаются в порядке генерации
+        """
+
+        pool = self.pool
+        tried = []
+        if best_action is not None and pool.is_action_possible(best_action, side):
+            tried.append(best_action)
+            yield best_action
+
+        # Время формирования этапов (вместе с сортировкой по истории) идет в статистику генерации ходов
+        stats = self.stats
+        stages = pool.create_action_stages(side)
+        movegen_start = perf_counter()
+        stage = next(stages)
+        stats.movegen_time += perf_counter() - movegen_start
+        for action in stage:
+            if action != best_action:
+                yield action
+
+        for killer in self.killers[self.search_depth - d]:
+            if killer is not None and killer not in tried and pool.is_action_possible(killer, side):
+                tried.append(killer)
+                yield killer
+
+        history = self.history[side]
+        while True:
+            movegen_start = perf_counter()
+            stage = next(stages, None)
+            if stage is not None and len(stage) > 1:
+                stage = sorted(stage, key=lambda x: history.get(x, 0), reverse=True)
+            stats.movegen_time += perf_counter() - movegen_start
+            if stage is None:
+                break
+            for action in stage:
+                if action not in tried:
+                    yield action
+
+    def _save_cutoff(self, action, side, d, number):
+        self.stats.cutoff_count += 1
+        if not number:
+            self.stats.first_move_cutoff_count += 1
+
+        # Выталкивающие ходы и так просматриваются одними из первых
+        if self.pool.DROP_ACTIONS[action]:
+            return
+
+        killers = self.killers[self.search_depth - d]
+        if action != killers[0]:
+            killers[1] = killers[0]
+            killers[0] = action
+
+        history = self.history[side]
+        history[action] = history.get(action, 0) + d * d
+
+    def _check_time(self):
+        # По внешнему сигналу поиск отменяется сразу, а по истечении времени или сигналу завершения - только после
+        # первой итерации, которая всегда доводится до конца, чтобы у компьютера был ход
+        if self.stop_check and self.stop_check():
+            self.stop_flag = True
+            self.cancel_flag = True
+        if self.completed_depth is not None and self.deadline and datetime.now() >= self.deadline:
+            self.stop_flag = True
+        if self.completed_depth is not None and self.finish_check and self.finish_check():
+            self.stop_flag = True
+
+    def _save_rate(self, rate, alpha, beta, d, best_action):
+        # Оценки, полученные после прерывания поиска, неточны - их не сохраняем. Не сохраняются и оценки, в переборе
+        # которых сменился этап партии: они зависят от номера хода, а он в хэш позиции не входит
+        if not self.tt or self.stop_flag or d > self.pool.get_phase_depth():
+            return
 
-            self.pool.cancel_action()
-            yield max_rate
+        flag = self.tt.EXACT
+        if rate < alpha:
+            flag = self.tt.UPPER
+        elif rate > beta:
+            flag = self.tt.LOWER
+        self.tt.put(self.pool.hash, rate, d, flag, best_action)
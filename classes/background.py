@@ -14,5 +14,20 @@ class Background:
                 color = (color_component,) * 3
                 pg.draw.rect(self.surface, color, (x, y, self.STEP, self.STEP))
 
+        # Флаг необходимости перерисовки всего окна (при первом кадре и после того, как окно было перекрыто)
+        self.redraw_flag = True
+
+    def invalidate(self):
+        self.redraw_flag = True
+
+    def update(self):
+        """ Метод возвращает список прямоугольников, изменившихся с прошлого кадра """
+
+        if not self.redraw_flag:
+            return []
+
+        self.redraw_flag = False
+        return [self.surface.get_rect()]
+
     def draw(self):
         self.sc.blit(self.surface, (0, 0))
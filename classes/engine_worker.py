@@ -0,0 +1,97 @@
+import atexit
+import multiprocessing
+import queue
+from .pool import Pool
+from .ai import Ai
+
+
+def engine_main(request_queue, response_queue, active_request_id):
+    """
+    Цикл процесса движка. Процесс получает из очереди запросов позицию (в виде списка сделанных ходов),
+    ищет в ней ход компьютера и отправляет его в очередь ответов. Поиск прерывается, как только номер активного
+    запроса перестает совпадать с номером обрабатываемого. Таблица транспозиций сохраняется между запросами
+    """
+
+    ai = Ai(Pool())
+    try:
+        while True:
+            request = request_queue.get()
+            if request is None:
+                break
+
+            request_id, actions = request
+            pool = Pool()
+            for action in actions:
+                pool.apply_action(action)
+            ai.pool = pool
+
+            action = ai.find_action(lambda: active_request_id.value != request_id)
+            if action is not None:
+                response_queue.put((request_id, action))
+    finally:
+        ai.close()
+
+
+class EngineWorker:
+    """
+    Фоновый процесс расчета ходов компьютера. Поиск идет с полной скоростью и не зависит от частоты кадров,
+    а основной процесс только отправляет запросы и периодически проверяет, готов ли ответ
+    """
+
+    def __init__(self):
+        self.request_queue = multiprocessing.Queue()
+        self.response_queue = multiprocessing.Queue()
+        self.process = None
+
+        # Номер последнего запроса и сигнал отмены - номер запроса, расчет по которому нужно продолжать
+        # (0 - никакой). Ответы на более ранние запросы игнорируются
+        self.request_id = 0
+        self.active_request_id = multiprocessing.Value('i', 0, lock=False)
+        self.is_busy = False
+        atexit.register(self.close)
+
+    def request(self, actions):
+        """ Метод отправляет запрос на расчет хода в позиции, заданной списком сделанных ходов """
+
+        if self.process is None:
+            # Процесс не демонический: при параллельном поиске он сам запускает вспомогательные процессы
+            self.process = multiprocessing.Process(
+                target=engine_main,
+                args=(self.request_queue, self.response_queue, self.active_request_id)
+            )
+            self.process.start()
+
+        self.request_id += 1
+        self.active_request_id.value = self.request_id
+        self.request_queue.put((self.request_id, list(actions)))
+        self.is_busy = True
+
+    def poll(self):
+        """ Метод возвращает рассчитанный ход или None, если ответ на последний запрос еще не готов """
+
+        while self.is_busy:
+            try:
+                request_id, action = self.response_queue.get_nowait()
+            except queue.Empty:
+                return None
+            if request_id == self.request_id:
+                self.is_busy = False
+                return action
+        return None
+
+    def cancel(self):
+        """ Метод прерывает расчет хода по последнему запросу """
+
+        self.active_request_id.value = 0
+        self.is_busy = False
+
+    def close(self):
+        if self.process is None:
+            return
+
+        self.active_request_id.value = 0
+        self.request_queue.put(None)
+        self.process.join(5)
+        if self.process.is_alive():
+            self.process.terminate()
+        self.process = None
@@ -0,0 +1,113 @@
+import os
+import struct
+import sys
+from array import array
+from settings import CMP_SIDE, PLAYER_SIDE
+from .pool import Pool
+from .paths import get_game_path
+
+
+class GameRecords:
+    """
+    Файл записей партий: заголовок файла, затем партии подряд. Партия - короткий заголовок (количество ходов и итог)
+    и ходы в упакованном виде (см. Pool), по два байта на ход. Файл только дописывается: новая партия добавляется
+    в конец, а оборванная при аварийном завершении последняя партия отбрасывается при следующем открытии на запись.
+    Чтение потоковое - партии читаются по одной, и файл может быть сколь угодно большим
+    """
+
+    MAGIC = b'ABLNGAME'
+    VERSION = 1
+    HEADER_STRUCT = struct.Struct('<8sI')
+
+    # Количество ходов партии и итог (0 - партия не закончена, иначе - номер победившей стороны в RESULT_SIDES)
+    GAME_STRUCT = struct.Struct('<HB')
+    RESULT_SIDES = [None, PLAYER_SIDE, CMP_SIDE]
+
+    def __init__(self, path):
+        self.path = get_game_path(path)
+
+        # Файл открывается на запись при добавлении первой партии
+        self.file = None
+
+    def _open(self):
+        is_new = not os.path.isfile(self.path) or os.path.getsize(self.path) < self.HEADER_STRUCT.size
+        self.file = open(self.path, 'wb' if is_new else 'r+b')
+        if is_new:
+            self.file.write(self.HEADER_STRUCT.pack(self.MAGIC, self.VERSION))
+            return
+
+        magic, version = self.HEADER_STRUCT.unpack(self.file.read(self.HEADER_STRUCT.size))
+        if magic != self.MAGIC or version != self.VERSION:
+            self.file.close()
+            self.file = None
+            raise ValueError('{} - не файл записей партий'.format(self.path))
+
+        # Пропускаем партии по заголовкам и отрезаем оборванный конец файла, если он есть
+        size = os.path.getsize(self.path)
+        offset = self.HEADER_STRUCT.size
+        while offset + self.GAME_STRUCT.size <= size:
+            self.file.seek(offset)
+            moves_count, _ = self.GAME_STRUCT.unpack(self.file.read(self.GAME_STRUCT.size))
+            next_offset = offset + self.GAME_STRUCT.size + moves_count * 2
+            if next_offset > size:
+                break
+            offset = next_offset
+        self.file.truncate(offset)
+        self.file.seek(offset)
+
+    def append(self, actions, winner=None):
+        """ Метод дописывает в файл партию из ходов actions с итогом winner (сторона-победитель или None) """
+
+        if self.file is None:
+            self._open()
+
+        moves = array('H', actions)
+        if sys.byteorder != 'little':
+            moves.byteswap()
+        self.file.write(self.GAME_STRUCT.pack(len(moves), self.RESULT_SIDES.index(winner)) + moves.tobytes())
+
+    def close(self):
+        if self.file:
+            self.file.close()
+        self.file = None
+
+    @classmethod
+    def read(cls, path):
+        """ Генератор партий из файла path - пар (ходы в виде array('H'), сторона-победитель или None) """
+
+        with open(path, 'rb') as file:
+            header = file.read(cls.HEADER_STRUCT.size)
+            if len(header) < cls.HEADER_STRUCT.size or cls.HEADER_STRUCT.unpack(header) != (cls.MAGIC, cls.VERSION):
+                raise ValueError('{} - не файл записей партий'.format(path))
+
+            while True:
+                game_header = file.read(cls.GAME_STRUCT.size)
+                if len(game_header) < cls.GAME_STRUCT.size:
+                    break
+                moves_count, result = cls.GAME_STRUCT.unpack(game_header)
+                data = file.read(moves_count * 2)
+                if len(data) < moves_count * 2:
+                    break
+
+                moves = array('H')
+                moves.frombytes(data)
+                if sys.byteorder != 'little':
+                    moves.byteswap()
+                yield moves, cls.RESULT_SIDES[result]
+
+    @classmethod
+    def replay(cls, path):
+        """
+        Генератор, воспроизводящий партии из файла path: после каждого хода выдается тройка (номер партии, пул, ход).
+        Пул у партии один и меняется следующим ходом, поэтому хранить его нельзя - только копировать нужные данные.
+        Возможность ходов не проверяется (кроме того, что такие упакованные ходы существуют)
+        """
+
+        for game_number, (moves, _) in enumerate(cls.read(path)):
+            pool = Pool()
+            action_steps = Pool.ACTION_STEPS
+            for action in moves:
+                if action >= Pool.ACTIONS_COUNT or action_steps[action] is None:
+                    raise ValueError('неверный ход {} в партии {}'.format(action, game_number))
+                pool.apply_action(action)
+                yield game_number, pool, action
@@ -1,4 +1,5 @@
 from settings import PLAYER_SIDE, CMP_SIDE
+from .pool import Pool
 
 
 class Group:
@@ -18,7 +19,7 @@ class Group:
             return
 
         # Если игрок кликнул на ячейке без ширика или на ячейке с вражеским шариком - очищаем группу
-        ball = self.pool_painter.cells[key]['content']
+        ball = self.pool_painter.get_content(key)
         if not ball or ball != PLAYER_SIDE:
             self.clear()
             return
@@ -53,6 +54,8 @@ class Group:
         self.pool_painter.set_group(self.group)
 
     def create_action(self, pos):
+        """ Метод возвращает ход игрока (в упакованном виде, см. Pool) или None, если такой ход невозможен """
+
         if not self.group:
             return None
 
@@ -60,19 +63,22 @@ class Group:
         if not key:
             return None
 
-        return self._create_shift_actions(key) or self._create_line_actions(key)
+        pairs = self._create_shift_actions(key) or self._create_line_actions(key)
+        if not pairs:
+            return None
+        return self.pool_painter.pool.encode_action(pairs, PLAYER_SIDE)
 
     def _create_shift_actions(self, key):
         """ Метод формирует и возвращает ход сдвига или возвращает None, если этого нельзя сделать """
 
         # Проверяем, пуста ли ячейка, в которую кликнул пользователь для перемещения группы
-        cells = self.pool_painter.cells
-        if cells[key]['content']:
+        get_content = self.pool_painter.get_content
+        if get_content(key):
             return None
 
         # Ищем направление движения для ячеек группы (оно должно определяться однозначно, иначе ход невозможен)
         direction = [
-            direction for g_key in self.group for direction in range(6) if cells[g_key]['around'][direction] == key
+            direction for g_key in self.group for direction in range(6) if Pool.AROUND[g_key][direction] == key
         ]
         if not direction or len(direction) > 1:
             return None
@@ -81,9 +87,8 @@ class Group:
         # Формируем конечный список ходов, при этом проверяем, чтобы каждая ячейка, в кторую двигается шарик была пуста
         result = []
         for g_key in self.group:
-            group_cell = cells[g_key]
-            n_key = group_cell['around'][direction]
-            if not n_key or cells[n_key]['content']:
+            n_key = Pool.AROUND[g_key][direction]
+            if not n_key or get_content(n_key):
                 return None
             result.append((g_key, n_key))
 
@@ -97,8 +102,8 @@ class Group:
             return None
 
         # Блокируем попытку сдвинуть группой свой шарик
-        cells = self.pool_painter.cells
-        if cells[key]['content'] == PLAYER_SIDE:
+        get_content = self.pool_painter.get_content
+        if get_content(key) == PLAYER_SIDE:
             return None
 
         # Проверяем, находится ли ячейка, в которую кликнул пользователь на одной линии с группой
@@ -111,7 +116,7 @@ class Group:
 
         # Проверяем, достижима ли ячейка, выбранная пользователем из ячеек группы. Если да, то фиксируем направление
         direction = [
-            direction for g_key in self.group for direction in range(6) if cells[g_key]['around'][direction] == key
+            direction for g_key in self.group for direction in range(6) if Pool.AROUND[g_key][direction] == key
         ]
         if not direction:
             return None
@@ -123,29 +128,26 @@ class Group:
         # Создаем сдвиги для ячеек группы
         result = []
         for g_key in self.group:
-            group_cell = cells[g_key]
-            n_key = group_cell['around'][direction]
+            n_key = Pool.AROUND[g_key][direction]
             result.append((g_key, n_key))
 
         # Если группа толкает ячейки противника, то создаем сдвиги и для них
-        if cells[key]['content'] == CMP_SIDE:
+        if get_content(key) == CMP_SIDE:
             s_key = key
-            s_cell = cells[key]
             while True:
-                n_key = s_cell['around'][direction]
+                n_key = Pool.AROUND[s_key][direction]
                 result.append((s_key, n_key))
                 if len(result) > (2 * len(self.group) - 1):
                     return None
                 if not n_key:
                     break
-                n_cell = cells[n_key]
-                if not n_cell['content']:
+                n_content = get_content(n_key)
+                if not n_content:
                     break
-                if n_cell['content'] == PLAYER_SIDE:
+                if n_content == PLAYER_SIDE:
                     return None
 
                 s_key = n_key
-                s_cell = n_cell
 
         # Реверсируем и возвращаем результат
         result.reverse()
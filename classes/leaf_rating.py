@@ -0,0 +1,122 @@
+import numpy as np
+from settings import RATING_COUNT_WEIGHT, RATING_DIST_WEIGHT, RATING_A_FACTORS, RATING_COVER_WEIGHT, RATING_DROP_WEIGHT
+from .pool import Pool
+
+
+class LeafRating:
+    """
+    Пакетная оценка позиций, получающихся после каждого из ходов в текущей позиции пула. Каждая дочерняя позиция
+    кодируется строкой массива (по столбцу на ячейку, отдельно для шариков компьютера и игрока), и все составляющие
+    оценки считаются для всех строк сразу. Результат совпадает с get_rating пула после применения хода
+    """
+
+    def __init__(self):
+        if Pool.KEYS is None:
+            Pool._create_tables()
+
+        # Кроме 61 ячейки в строке есть два служебных столбца: всегда пустой (соседи за краем доски и ячейка,
+        # в которую попадает вытолкнутый шарик) и всегда занятый (дополняет паттерны выталкивающих ходов до одной длины)
+        cells_count = len(Pool.KEYS)
+        self.empty_column = cells_count
+        self.full_column = cells_count + 1
+        self.columns_count = cells_count + 2
+
+        # Номера бит ячеек - для перевода доски пула в строку массива
+        self.positions = np.array([bit.bit_length() - 1 for bit in Pool.CELL_BITS], dtype=np.int64)
+
+        # Веса ячеек для первого и второго этапов оценки: количество шариков, расстояния и координата a
+        self.cell_weights = np.zeros((self.columns_count, 3), dtype=np.int64)
+        self.cell_weights[:cells_count, 0] = 1
+        self.cell_weights[:cells_count, 1] = Pool.DIST_RATES
+        self.cell_weights[:cells_count, 2] = Pool.A_VALUES
+
+        # Соседи на один и два шага вперед по каждой из трех осей (для прикрытий) - подряд для всех осей
+        cover_cells = []
+        cover_next_1 = []
+        cover_next_2 = []
+        for axis in range(3):
+            for index in range(cells_count):
+                ray = Pool.RAYS[index * 6 + axis]
+                cover_cells.append(index)
+                cover_next_1.append(ray[0] if len(ray) > 0 else self.empty_column)
+                cover_next_2.append(ray[1] if len(ray) > 1 else self.empty_column)
+        self.cover_cells = np.array(cover_cells)
+        self.cover_next_1 = np.array(cover_next_1)
+        self.cover_next_2 = np.array(cover_next_2)
+
+        # Паттерны выталкивающих ходов (без повторов), дополненные до одинаковой длины всегда занятым столбцом
+        patterns = []
+        for cell_patterns in Pool.DROP_VICTIM_PATTERNS:
+            for pattern in cell_patterns:
+                if pattern not in patterns:
+                    patterns.append(pattern)
+        victims = []
+        pushers = []
+        for victim_mask, pusher_mask in patterns:
+            victim_indices = [index for index, bit in enumerate(Pool.CELL_BITS) if victim_mask & bit]
+            pusher_indices = [index for index, bit in enumerate(Pool.CELL_BITS) if pusher_mask & bit]
+            victims.append(victim_indices + [self.full_column] * (2 - len(victim_indices)))
+            pushers.append(pusher_indices + [self.full_column] * (3 - len(pusher_indices)))
+        self.drop_victims = np.array(victims)
+        self.drop_pushers = np.array(pushers)
+
+    def _get_boards(self, pool):
+        """ Метод возвращает доски пула в виде массива 2 x columns_count (строка компьютера и строка игрока) """
+
+        result = np.zeros((2, self.columns_count), dtype=np.int8)
+        for row, board in enumerate((pool.cmp_board, pool.player_board)):
+            bits = np.unpackbits(np.frombuffer(board.to_bytes(16, 'little'), dtype=np.uint8), bitorder='little')
+            result[row, :self.empty_column] = bits[self.positions]
+        result[:, self.full_column] = 1
+        return result
+
+    def rate_actions(self, pool, actions):
+        """ Метод возвращает массив оценок позиций, получающихся после применения каждого из ходов actions """
+
+        # Перемещения шариков всех ходов собираются в общие массивы: номер хода, откуда и куда
+        rows = []
+        old_indices = []
+        next_indices = []
+        action_steps = Pool.ACTION_STEPS
+        empty_column = self.empty_column
+        for row, action in enumerate(actions):
+            for old_index, next_index in action_steps[action]:
+                rows.append(row)
+                old_indices.append(old_index)
+                next_indices.append(next_index if next_index is not None else empty_column)
+        old_indices = np.array(old_indices)
+        next_indices = np.array(next_indices)
+
+        # Массив позиций: ход x сторона x ячейка. Сначала освобождаются все ячейки, из которых уходят шарики,
+        # затем заполняются ячейки, в которые они приходят
+        parent = self._get_boards(pool)
+        boards = np.repeat(parent[np.newaxis], len(actions), axis=0)
+        boards[rows, :, old_indices] = 0
+        boards[rows, :, next_indices] = parent[:, old_indices].T
+        boards[:, :, empty_column] = 0
+
+        # Первый и второй этапы - количество шариков, их близость к центру доски и стороне противника
+        factor_a = RATING_A_FACTORS[0]
+        actions_count = len(pool.actions) + 1
+        if 21 <= actions_count <= 45:
+            factor_a = RATING_A_FACTORS[1]
+        if actions_count > 45:
+            factor_a = RATING_A_FACTORS[2]
+        counts, dists, a_sums = np.moveaxis(boards @ self.cell_weights, 2, 0)
+        result = (counts[:, 0] ** 2 - counts[:, 1] ** 2) * RATING_COUNT_WEIGHT
+        result += (dists[:, 0] - dists[:, 1]) * RATING_DIST_WEIGHT - (a_sums[:, 0] + a_sums[:, 1]) * factor_a
+
+        # Третий этап - прикрытия
+        pairs = boards[:, :, self.cover_cells] & boards[:, :, self.cover_next_1]
+        triples = pairs & boards[:, :, self.cover_next_2]
+        covers = pairs.sum(axis=2, dtype=np.int64) + 8 * triples.sum(axis=2, dtype=np.int64)
+        result += (covers[:, 0] - covers[:, 1]) * RATING_COVER_WEIGHT
+
+        # Четвертый этап - выталкивающие ходы. Ход есть у стороны, шарики которой стоят на месте толкателей паттерна,
+        # если на месте жертв стоят шарики противника
+        victims = boards[:, :, self.drop_victims].all(axis=3)
+        pushers = boards[:, :, self.drop_pushers].all(axis=3)
+        drops = (pushers & victims[:, ::-1]).sum(axis=2, dtype=np.int64)
+        result += (drops[:, 0] ** 2 - drops[:, 1] ** 2) * RATING_DROP_WEIGHT
+
+        return result
@@ -12,14 +12,29 @@ class MsgPane:
         self.back_surface.set_alpha(100)
         self.text_surface = None
 
+        # Флаг необходимости перерисовки: сообщение затеняет все окно, поэтому перерисовывается оно целиком
+        self.refresh_flag = False
+
     def set_msg(self, msg):
         self.msg = msg
         font = self.pg.font.Font(None, 72)
         self.text_surface = font.render(msg, True, self.TEXT_COLOR)
+        self.refresh_flag = True
 
     def clear_msg(self):
+        if self.msg:
+            self.refresh_flag = True
         self.msg = None
 
+    def update(self):
+        """ Метод возвращает список прямоугольников, изменившихся с прошлого кадра """
+
+        if not self.refresh_flag:
+            return []
+
+        self.refresh_flag = False
+        return [self.back_surface.get_rect()]
+
     def draw(self):
         if not self.msg:
             return
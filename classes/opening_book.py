@@ -0,0 +1,104 @@
+import mmap
+import os
+import random
+import struct
+from .pool import Pool
+from .paths import get_game_path
+
+
+class OpeningBook:
+    """
+    Дебютная книга - файл с отсортированными записями фиксированной длины (хэш позиции, хэш позиции после хода).
+    Файл не загружается в память целиком: он отображается в память через mmap, а записи позиции ищутся двоичным
+    поиском. Ход хранится через хэш получающейся позиции, поэтому книга не зависит от того, как записываются ходы
+    и в каком порядке они генерируются. После изменения хэширования позиций книгу нужно перестроить (build_book.py).
+    Книга, построенная при других весах оценки позиции (отпечаток Pool.RATING_KEY в заголовке), не используется
+    """
+
+    MAGIC = b'ABLNBOOK'
+    VERSION = 2
+
+    # Метка формата, версия, отпечаток весов оценки, количество записей
+    HEADER_STRUCT = struct.Struct('<8sIII')
+    RECORD_STRUCT = struct.Struct('<QQ')
+
+    def __init__(self, path):
+        self.path = get_game_path(path)
+
+        # Файл открывается при первом обращении к книге
+        self.data = None
+        self.records_count = 0
+        self.is_opened = False
+
+    def _open(self):
+        self.is_opened = True
+        if not os.path.isfile(self.path) or os.path.getsize(self.path) < self.HEADER_STRUCT.size:
+            return
+
+        with open(self.path, 'rb') as file:
+            data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, rating_key, records_count = self.HEADER_STRUCT.unpack_from(data, 0)
+        if magic != self.MAGIC or version != self.VERSION or rating_key != Pool.RATING_KEY or \
+                len(data) != self.HEADER_STRUCT.size + records_count * self.RECORD_STRUCT.size:
+            data.close()
+            return
+
+        self.data = data
+        self.records_count = records_count
+
+    def get_next_hashes(self, position_hash):
+        """ Метод возвращает список хэшей позиций, получающихся после книжных ходов из позиции position_hash """
+
+        if not self.is_opened:
+            self._open()
+        if not self.data:
+            return []
+
+        # Двоичный поиск первой записи позиции
+        low, high = 0, self.records_count
+        while low < high:
+            middle = (low + high) // 2
+            record_hash, _ = self.RECORD_STRUCT.unpack_from(self.data, self._get_offset(middle))
+            if record_hash < position_hash:
+                low = middle + 1
+            else:
+                high = middle
+
+        result = []
+        while low < self.records_count:
+            record_hash, next_hash = self.RECORD_STRUCT.unpack_from(self.data, self._get_offset(low))
+            if record_hash != position_hash:
+                break
+            result.append(next_hash)
+            low += 1
+        return result
+
+    def find_action(self, pool, actions):
+        """ Метод возвращает случайный из книжных ходов actions в текущей позиции пула или None, если их нет """
+
+        next_hashes = self.get_next_hashes(pool.hash)
+        if not next_hashes:
+            return None
+
+        book_actions = []
+        for action in actions:
+            pool.apply_action(action)
+            if pool.hash in next_hashes:
+                book_actions.append(action)
+            pool.cancel_action()
+        if not book_actions:
+            return None
+        return random.choice(book_actions)
+
+    def _get_offset(self, index):
+        return self.HEADER_STRUCT.size + index * self.RECORD_STRUCT.size
+
+    @classmethod
+    def write(cls, path, records):
+        """ Метод записывает книгу из пар (хэш позиции, хэш позиции после хода) """
+
+        records = sorted(set(records))
+        with open(path, 'wb') as file:
+            file.write(cls.HEADER_STRUCT.pack(cls.MAGIC, cls.VERSION, Pool.RATING_KEY, len(records)))
+            for record in records:
+                file.write(cls.RECORD_STRUCT.pack(*record))
@@ -0,0 +1,12 @@
+import os
+
+# Каталог игры (в нем лежат settings.py и скрипты)
+GAME_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def get_game_path(path):
+    """ Функция возвращает путь к файлу path. Относительный путь отсчитывается от каталога игры """
+
+    if os.path.isabs(path):
+        return path
+    return os.path.join(GAME_DIR, path)
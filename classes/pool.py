@@ -1,14 +1,16 @@
 import itertools
-from copy import deepcopy
-from settings import CMP_SIDE, PLAYER_SIDE
+import random
+import zlib
+from array import array
+from settings import CMP_SIDE, PLAYER_SIDE, RATING_COUNT_WEIGHT, RATING_DIST_WEIGHT, RATING_A_FACTORS, \
+    RATING_COVER_WEIGHT, RATING_DROP_WEIGHT
+from .snapshot import Snapshot
 
 
 class Pool:
     DELTA_KEYS = [(0, 1, 1), (1, 0, 1), (1, -1, 0), (0, -1, -1), (-1, 0, -1), (-1, 1, 0)]
-    SHORT_DELTA_KEYS = DELTA_KEYS[:3]
 
-    LINE_PATTERNS = ['**#r', '***##r', '***##e', '***#e', '**#e', '***e', '**e']
-    LINE_PATTERNS_SET = set(LINE_PATTERNS)
+    LINE_PATTERNS = ['**#r', '***#r', '***##r', '***##e', '***#e', '**#e', '***e', '**e']
 
     OTHER_SIDE_DICT = {CMP_SIDE: PLAYER_SIDE, PLAYER_SIDE: CMP_SIDE}
 
@@ -17,86 +19,448 @@ class Pool:
 
     MAX_RATE = 1000000000
 
+    # Отпечаток весов оценки позиции. Хранится в заголовках файлов кэша поиска и дебютной книги: файл, построенный
+    # при других весах, не используется
+    RATING_KEY = zlib.crc32(repr((
+        RATING_COUNT_WEIGHT, RATING_DIST_WEIGHT, tuple(RATING_A_FACTORS), RATING_COVER_WEIGHT, RATING_DROP_WEIGHT
+    )).encode())
+
+    # Доска хранится в виде двух целых чисел (по одному на сторону). Ячейка (a, b, c) занимает
+    # бит (a + 5) * 11 + (b + 5). Значимых бит всего 61, но вокруг доски оставлена рамка из всегда пустых бит -
+    # благодаря ей сосед любой ячейки по направлению direction получается простым сдвигом всего числа
+    # на BIT_SHIFTS[direction] без переноса между рядами
+    GRID_SIZE = 11
+    BIT_SHIFTS = [1, 11, 10, -1, -11, -10]
+
+    # Случайные числа для хэширования позиций генерируются с фиксированным зерном, чтобы хэши совпадали между запусками
+    ZOBRIST_SEED = 20201205
+
+    # Лучи из каждой ячейки по каждому направлению хранятся на длину до RAY_LENGTH ячеек (больше не нужно ни одному ходу
+    # и ни одной составляющей оценки)
+    RAY_LENGTH = 5
+
+    # Ход хранится в виде целого числа: номер ячейки, с которой начинается ход (биты 0-5), направление хода (биты 6-8),
+    # ось группы (биты 9-10), количество своих шариков (биты 11-12) и количество толкаемых чужих (биты 13-14).
+    # Линейный ход начинается с хвоста линии, ход сдвига - с первой ячейки группы по оси. Для линейных ходов и ходов
+    # одним шариком ось - направление хода по модулю 3. Ни один ход не равен 0. Списки ходов - массивы array('I')
+    ACTIONS_COUNT = 1 << 15
+
+    # Текстовая запись позиции - ходы из начальной расстановки подряд, каждый в виде трех цифр по основанию 36
+    # (упакованный ход меньше 36 ** 3). Начальная расстановка записывается как START_NOTATION
+    NOTATION_DIGITS = '0123456789abcdefghijklmnopqrstuvwxyz'
+    START_NOTATION = '-'
+
+    # Таблицы, общие для всех экземпляров. Заполняются один раз в процессе - при создании первого пула.
+    # Ячейки в таблицах обозначаются номерами от 0 до 60 (индекс ключа ячейки в KEYS)
+    KEYS = None
+    KEY_INDICES = None
+    CELL_BITS = None
+    KEY_BITS = None
+    POS_INDICES = None
+    RAYS = None
+    AROUND = None
+    BOARD_MASK = 0
+    EDGE_MASKS = None
+    RING_MASK = 0
+    DIST_RATES = None
+    A_VALUES = None
+    COVER_NEIGHBOURS = None
+    DROP_VICTIM_PATTERNS = None
+    DROP_PUSHER_PATTERNS = None
+    ZOBRIST_CMP_KEYS = None
+    ZOBRIST_PLAYER_KEYS = None
+    ZOBRIST_SIDE_KEY = 0
+    ZOBRIST_PHASE_KEYS = None
+    LINE_ACTIONS = None
+    SHIFT_ACTIONS = None
+    SINGLE_ACTIONS = None
+    ACTION_STEPS = None
+    ACTION_CONDITIONS = None
+    DROP_ACTIONS = None
+    ACTION_PAIRS = None
+    PAIRS_ACTIONS = None
+
     def __init__(self):
+        if Pool.KEYS is None:
+            Pool._create_tables()
+
         self.actions = []
         self.last_action_description = None
-        self.cells = {
-            (0, 0, 0): {
-                'content': None,
-                'around': [None] * 6
-            }
-        }
-
-        # Генерируем ячейки
-        for path in itertools.combinations_with_replacement('012345', 4):
-            a, b, c = (0,) * 3
-            for step in path:
-                step = int(step)
-                da, db, dc = self.DELTA_KEYS[step]
-                a, b, c = a + da, b + db, c + dc
-
-            if (a, b, c) not in self.cells:
-                self.cells[(a, b, c)] = {
-                    'content': None,
-                    'around': [None] * 6
-                }
-
-        # Для каждой ячейки указываем смежные ей по различным направлениям
-        for (a, b, c), cell in self.cells.items():
-            for direction, (da, db, dc) in enumerate(self.DELTA_KEYS):
-                _a, _b, _c = a + da, b + db, c + dc
-                if (_a, _b, _c) in self.cells:
-                    cell['around'][direction] = (_a, _b, _c)
 
         # Расставляем шарики по ячейкам
         cmp_cell_keys = self._get_cmp_init_data()
         player_cell_keys = self._get_player_init_data()
-        for key, cell in self.cells.items():
-            if key in cmp_cell_keys:
-                cell['content'] = CMP_SIDE
-            if key in player_cell_keys:
-                cell['content'] = PLAYER_SIDE
+        self.cmp_board = 0
+        for key in cmp_cell_keys:
+            self.cmp_board |= self.KEY_BITS[key]
+        self.player_board = 0
+        for key in player_cell_keys:
+            self.player_board |= self.KEY_BITS[key]
 
         # Поля для хранения количества шариков
         self.cmp_balls_count = len(cmp_cell_keys)
         self.player_balls_count = len(player_cell_keys)
 
+        # Накапливаемые составляющие оценки позиции и стек их значений до каждого из сделанных ходов
+        self.rates = self._create_rates()
+        self.rates_stack = []
+
+        # Хэш позиции (по Зобристу) и стек его значений до каждого из сделанных ходов
+        self.hash = self._create_hash()
+        self.hash_stack = []
+
         # Объекты для хранения копий состояний
-        self.cells_copy = deepcopy(self.cells)
-        self.actions_copy = deepcopy(self.actions)
-        self.last_action_description_copy = deepcopy(self.last_action_description)
-        self.cmp_balls_count_copy = self.cmp_balls_count
-        self.player_balls_count_copy = self.player_balls_count
-
-        # Готовим список паттернов для проверки наличия выталкивающих ходов
-        self.drop_patterns = []
-        for a, b, c in self.cells.keys():
-            if (abs(a) + abs(b) + abs(c)) != 8:
+        self.snapshot_copy = None
+        self.actions_copy = None
+        self.last_action_description_copy = None
+        self.rates_copy = None
+        self.rates_stack_copy = None
+        self.hash_copy = None
+        self.hash_stack_copy = None
+        self.backup_state()
+
+    @classmethod
+    def _create_tables(cls):
+        # Генерируем ключи ячеек
+        keys = [(0, 0, 0)]
+        for path in itertools.combinations_with_replacement('012345', 4):
+            a, b, c = (0,) * 3
+            for step in path:
+                step = int(step)
+                da, db, dc = cls.DELTA_KEYS[step]
+                a, b, c = a + da, b + db, c + dc
+
+            if (a, b, c) not in keys:
+                keys.append((a, b, c))
+
+        cells_count = len(keys)
+        grid_len = cls.GRID_SIZE ** 2
+        key_indices = {key: index for index, key in enumerate(keys)}
+        cell_bits = [0] * cells_count
+        pos_indices = [None] * grid_len
+        for index, (a, b, c) in enumerate(keys):
+            pos = (a + 5) * cls.GRID_SIZE + (b + 5)
+            cell_bits[index] = 1 << pos
+            pos_indices[pos] = index
+
+        # Лучи: rays[index * 6 + direction] - номера ячеек, лежащих от ячейки index по направлению direction
+        # (не более RAY_LENGTH, ближайшая - первой). Координаты соседей вычисляются только здесь
+        rays = []
+        for a, b, c in keys:
+            for da, db, dc in cls.DELTA_KEYS:
+                ray = []
+                n_key = (a + da, b + db, c + dc)
+                while n_key in key_indices and len(ray) < cls.RAY_LENGTH:
+                    ray.append(key_indices[n_key])
+                    n_key = (n_key[0] + da, n_key[1] + db, n_key[2] + dc)
+                rays.append(tuple(ray))
+
+        # Для каждой ячейки указываем смежные ей по различным направлениям (для словаря ячеек cells)
+        around = {
+            key: [keys[ray[0]] if ray else None for ray in rays[index * 6:index * 6 + 6]]
+            for index, key in enumerate(keys)
+        }
+
+        board_mask = 0
+        ring_mask = 0
+        edge_masks = [0] * 6
+        dist_rates = [0] * cells_count
+        a_values = [0] * cells_count
+        cover_neighbours = [None] * cells_count
+        drop_victim_patterns = [[] for _ in range(cells_count)]
+        drop_pusher_patterns = [[] for _ in range(cells_count)]
+        line_actions = [[[None] * grid_len for _ in cls.LINE_PATTERNS] for _ in range(6)]
+        shift_actions = {}
+        single_actions = [[None] * grid_len for _ in range(6)]
+
+        # Таблицы ходов (индекс - упакованный ход): шаги хода - пары (номер ячейки, откуда сдвигается шарик, номер
+        # ячейки, куда он сдвигается, или None, если шарик уходит с доски) в порядке применения, условия хода - маски
+        # ячеек, где должны стоять свои и чужие шарики и которые должны быть пусты, признак выталкивающего хода
+        action_steps = [None] * cls.ACTIONS_COUNT
+        action_conditions = [None] * cls.ACTIONS_COUNT
+        drop_actions = [False] * cls.ACTIONS_COUNT
+
+        def add_action(action, steps, own_indices, other_indices):
+            # Пустыми должны быть все ячейки, куда сдвигаются шарики, кроме освобождаемых самим ходом
+            empty_indices = {n_index for _, n_index in steps if n_index is not None} - {o_index for o_index, _ in steps}
+            action_steps[action] = steps
+            action_conditions[action] = (
+                sum(cell_bits[s_index] for s_index in own_indices),
+                sum(cell_bits[s_index] for s_index in other_indices),
+                sum(cell_bits[e_index] for e_index in empty_indices)
+            )
+            drop_actions[action] = steps[0][1] is None
+        for index, key in enumerate(keys):
+            a, b, c = key
+            bit = cell_bits[index]
+            pos = bit.bit_length() - 1
+            cell_rays = rays[index * 6:index * 6 + 6]
+            board_mask |= bit
+            if (abs(a) + abs(b) + abs(c)) == 8:
+                ring_mask |= bit
+            dist_rates[index] = (8 - abs(a) + abs(b) + abs(c)) * 2
+            a_values[index] = a
+
+            # Соседи ячейки на расстоянии одного и двух шагов в обе стороны по каждой оси (для оценки прикрытий)
+            cover_neighbours[index] = []
+            for axis in range(3):
+                next_bits = [cell_bits[n_index] for n_index in cell_rays[axis][:2]] + [0, 0]
+                prev_bits = [cell_bits[n_index] for n_index in cell_rays[axis + 3][:2]] + [0, 0]
+                cover_neighbours[index].append(tuple(next_bits[:2] + prev_bits[:2]))
+
+            # Паттерны выталкивающих ходов: шарик (или два) на краевом кольце и два (или три) шарика противника за ними
+            if (abs(a) + abs(b) + abs(c)) == 8:
+                for direction in range(6):
+                    for victims_count, size in ((1, 3), (2, 5)):
+                        pattern = (index,) + cell_rays[direction][:size - 1]
+                        if len(pattern) < size:
+                            continue
+                        victim_mask = sum(cell_bits[p_index] for p_index in pattern[:victims_count])
+                        pusher_mask = sum(cell_bits[p_index] for p_index in pattern[victims_count:])
+                        for p_index in pattern[:victims_count]:
+                            drop_victim_patterns[p_index].append((victim_mask, pusher_mask))
+                        for p_index in pattern[victims_count:]:
+                            drop_pusher_patterns[p_index].append((victim_mask, pusher_mask))
+
+            for direction in range(6):
+                if not cell_rays[direction]:
+                    edge_masks[direction] |= bit
+                    continue
+                action = cls.pack_action(index, direction, direction % 3, 1, 0)
+                single_actions[direction][pos] = action
+                add_action(action, ((index, cell_rays[direction][0]),), (index,), ())
+
+                # Линейные ходы: шарики линии (сначала свои, затем чужие), начиная с ячейки index, сдвигаются на одну
+                # ячейку по direction. Паттерн, оканчивающийся краем доски, - последний шарик уходит за край
+                line_indices = (index,) + cell_rays[direction] + (None,)
+                for pattern_index, pattern in enumerate(cls.LINE_PATTERNS):
+                    own_count, other_count = pattern.count('*'), pattern.count('#')
+                    count = own_count + other_count
+                    if len(line_indices) <= count or (line_indices[count] is None) != pattern.endswith('r'):
+                        continue
+                    action = cls.pack_action(index, direction, direction % 3, own_count, other_count)
+                    line_actions[direction][pattern_index][pos] = action
+                    steps = tuple((line_indices[number - 1], line_indices[number]) for number in range(count, 0, -1))
+                    add_action(action, steps, line_indices[:own_count], line_indices[own_count:count])
+
+            # Ходы сдвига: группа из count шариков вдоль оси axis перемещается по направлению direction
+            for axis in range(3):
+                for count in (2, 3):
+                    group_indices = (index,) + cell_rays[axis][:count - 1]
+                    if len(group_indices) < count:
+                        continue
+                    for direction in range(6):
+                        if direction == axis or direction == axis + 3:
+                            continue
+                        if not all(rays[g_index * 6 + direction] for g_index in group_indices):
+                            continue
+                        table = shift_actions.setdefault((count, axis, direction), [None] * grid_len)
+                        action = cls.pack_action(index, direction, axis, count, 0)
+                        table[pos] = action
+                        steps = tuple((g_index, rays[g_index * 6 + direction][0]) for g_index in group_indices)
+                        add_action(action, steps, group_indices, ())
+
+        # Ключи для хэширования: по одному на каждую пару ячейка-сторона, на очередь хода и на смену этапа партии
+        # (этапы сменяются на 21-м и 46-м ходах - так же, как множитель factor_a в оценке позиции)
+        generator = random.Random(cls.ZOBRIST_SEED)
+        cls.ZOBRIST_CMP_KEYS = [generator.getrandbits(64) for _ in keys]
+        cls.ZOBRIST_PLAYER_KEYS = [generator.getrandbits(64) for _ in keys]
+        cls.ZOBRIST_SIDE_KEY = generator.getrandbits(64)
+        cls.ZOBRIST_PHASE_KEYS = {21: generator.getrandbits(64), 46: generator.getrandbits(64)}
+
+        cls.KEYS = keys
+        cls.KEY_INDICES = key_indices
+        cls.CELL_BITS = cell_bits
+        cls.KEY_BITS = dict(zip(keys, cell_bits))
+        cls.POS_INDICES = pos_indices
+        cls.RAYS = rays
+        cls.AROUND = around
+        cls.BOARD_MASK = board_mask
+        cls.EDGE_MASKS = edge_masks
+        cls.RING_MASK = ring_mask
+        cls.DIST_RATES = dist_rates
+        cls.A_VALUES = a_values
+        cls.COVER_NEIGHBOURS = cover_neighbours
+        cls.DROP_VICTIM_PATTERNS = drop_victim_patterns
+        cls.DROP_PUSHER_PATTERNS = drop_pusher_patterns
+        cls.LINE_ACTIONS = line_actions
+        cls.SHIFT_ACTIONS = shift_actions
+        cls.SINGLE_ACTIONS = single_actions
+        cls.ACTION_STEPS = action_steps
+        cls.ACTION_CONDITIONS = action_conditions
+        cls.DROP_ACTIONS = drop_actions
+
+        # Представление ходов в виде пар ключей ячеек (откуда, куда) - для отрисовки и отладочных инструментов
+        action_pairs = [None] * cls.ACTIONS_COUNT
+        pairs_actions = {}
+        for action, steps in enumerate(action_steps):
+            if steps is None:
                 continue
-            for size in [3, 5]:
-                for da, db, dc in self.DELTA_KEYS:
-                    pattern = [(a + index * da, b + index * db, c + index * dc) for index in range(size)]
-                    if all([key in self.cells.keys() for key in pattern]):
-                        self.drop_patterns.append(pattern)
+            pairs = tuple((keys[o_index], keys[n_index] if n_index is not None else None) for o_index, n_index in steps)
+            action_pairs[action] = pairs
+            pairs_actions.setdefault(frozenset(pairs), []).append(action)
+        cls.ACTION_PAIRS = action_pairs
+        cls.PAIRS_ACTIONS = pairs_actions
+
+    @property
+    def cells(self):
+        """ Представление доски в виде словаря ячеек (для отладочных инструментов) """
+
+        result = {}
+        for key, bit in zip(self.KEYS, self.CELL_BITS):
+            content = None
+            if self.cmp_board & bit:
+                content = CMP_SIDE
+            if self.player_board & bit:
+                content = PLAYER_SIDE
+            result[key] = {
+                'content': content,
+                'around': list(self.AROUND[key])
+            }
+        return result
 
     def create_actions(self, side):
         line_actions = self._create_line_actions(side)
         shift_actions = self._create_shift_actions(side)
         return line_actions + shift_actions
 
+    @staticmethod
+    def pack_action(index, direction, axis, own_count, other_count):
+        """ Метод упаковывает ход в целое число (см. описание формата в начале класса) """
+
+        return index | direction << 6 | axis << 9 | own_count << 11 | other_count << 13
+
+    @classmethod
+    def decode_action(cls, action):
+        """ Метод возвращает ход в виде кортежа пар ключей ячеек (откуда, куда), None - шарик уходит с доски """
+
+        return cls.ACTION_PAIRS[action]
+
+    def encode_action(self, pairs, side):
+        """
+        Метод возвращает упакованный ход стороны side по набору пар ключей ячеек (откуда, куда) в любом порядке
+        или None, если такого хода в текущей позиции нет
+        """
+
+        for action in self.PAIRS_ACTIONS.get(frozenset(pairs), []):
+            if self.is_action_possible(action, side):
+                return action
+        return None
+
+    @classmethod
+    def format_actions(cls, actions):
+        """ Метод возвращает текстовую запись позиции, полученной ходами actions из начальной расстановки """
+
+        if not actions:
+            return cls.START_NOTATION
+
+        digits = cls.NOTATION_DIGITS
+        return ''.join(digits[action // 1296] + digits[action // 36 % 36] + digits[action % 36] for action in actions)
+
+    @classmethod
+    def parse_actions(cls, text):
+        """
+        Метод возвращает список ходов по текстовой записи позиции (см. format_actions). Возможность ходов
+        не проверяется. При неверной записи выбрасывается ValueError
+        """
+
+        if text == cls.START_NOTATION:
+            return []
+        if not text or len(text) % 3:
+            raise ValueError('неверная длина записи позиции')
+
+        actions = []
+        for start in range(0, len(text), 3):
+            action = int(text[start:start + 3], 36)
+            if not 0 < action < cls.ACTIONS_COUNT:
+                raise ValueError('неверная запись хода {}'.format(text[start:start + 3]))
+            actions.append(action)
+        return actions
+
+    @classmethod
+    def from_actions(cls, actions, mirrored=False):
+        """
+        Метод возвращает пул с позицией, полученной ходами actions из начальной расстановки (первым ходит игрок).
+        С флагом mirrored позиция зеркальна: доска отражена относительно центра, а стороны поменялись местами
+        (см. mirror_action). Если какой-то ход невозможен, выбрасывается ValueError
+        """
+
+        pool = cls()
+        side = PLAYER_SIDE
+        for action in actions:
+            if not 0 < action < cls.ACTIONS_COUNT or cls.ACTION_STEPS[action] is None or pool.get_winner_side():
+                raise ValueError('ход {} невозможен'.format(action))
+            if mirrored:
+                pool_action = pool.mirror_action(action, side)
+            else:
+                pool_action = action if pool.is_action_possible(action, side) else None
+            if pool_action is None:
+                raise ValueError('ход {} невозможен'.format(action))
+            pool.apply_action(pool_action)
+            side = cls.OTHER_SIDE_DICT[side]
+        return pool
+
+    def mirror_action(self, action, side):
+        """
+        Метод возвращает ход, зеркальный ходу action стороны side: ключи ячеек отражаются относительно центра доски,
+        а сторона меняется на другую. Позиция пула должна быть зеркальна той, в которой делается ход action.
+        Стартовая расстановка при отражении переходит в себя, поэтому ход за игрока можно искать как ход компьютера
+        в зеркальной партии
+        """
+
+        pairs = [
+            (tuple(-x for x in old_key), tuple(-x for x in next_key) if next_key else None)
+            for old_key, next_key in self.decode_action(action)
+        ]
+        return self.encode_action(pairs, self.OTHER_SIDE_DICT[side])
+
+    def is_action_possible(self, action, side):
+        """ Метод проверяет, может ли сторона side сделать ход action в текущей позиции, не формируя список ходов """
+
+        own, other = self._get_boards(side)
+        empty = self.BOARD_MASK ^ own ^ other
+        own_mask, other_mask, empty_mask = self.ACTION_CONDITIONS[action]
+        return own & own_mask == own_mask and other & other_mask == other_mask and empty & empty_mask == empty_mask
+
+    def create_action_stages(self, side):
+        """
+        Генератор ходов по этапам: выталкивающие ходы, остальные толкающие ходы, линейные ходы в пустую ячейку,
+        ходы сдвига (включая ходы одним шариком). Каждый этап - список ходов, и следующий этап формируется,
+        только когда он запрошен. Этапы в сумме дают тот же список ходов в том же порядке, что и create_actions
+        """
+
+        yield self._create_drop_actions(side)
+        yield self._create_push_actions(side)
+        yield self._create_inline_actions(side)
+        yield self._create_shift_actions(side)
+
+    def get_snapshot(self):
+        """ Метод возвращает неизменяемый снимок текущей расстановки шариков """
+
+        return Snapshot(self.cmp_board, self.player_board, self.cmp_balls_count, self.player_balls_count)
+
     def backup_state(self):
-        self.cells_copy = deepcopy(self.cells)
-        self.actions_copy = deepcopy(self.actions)
-        self.last_action_description_copy = deepcopy(self.last_action_description)
-        self.cmp_balls_count_copy = self.cmp_balls_count
-        self.player_balls_count_copy = self.player_balls_count
+        # Снимок доски, ходы, значения оценки и хэша неизменяемы, поэтому копируются только списки
+        self.snapshot_copy = self.get_snapshot()
+        self.actions_copy = list(self.actions)
+        self.last_action_description_copy = self.last_action_description
+        self.rates_copy = self.rates
+        self.rates_stack_copy = list(self.rates_stack)
+        self.hash_copy = self.hash
+        self.hash_stack_copy = list(self.hash_stack)
 
     def restore_state(self):
-        self.cells = self.cells_copy
-        self.actions = self.actions_copy
+        snapshot = self.snapshot_copy
+        self.cmp_board = snapshot.cmp_board
+        self.player_board = snapshot.player_board
+        self.cmp_balls_count = snapshot.cmp_balls_count
+        self.player_balls_count = snapshot.player_balls_count
+        self.actions = list(self.actions_copy)
         self.last_action_description = self.last_action_description_copy
-        self.cmp_balls_count = self.cmp_balls_count_copy
-        self.player_balls_count = self.player_balls_count_copy
+        self.rates = self.rates_copy
+        self.rates_stack = list(self.rates_stack_copy)
+        self.hash = self.hash_copy
+        self.hash_stack = list(self.hash_stack_copy)
 
     def apply_action(self, action):
         self.actions.append(action)
@@ -104,118 +468,217 @@ class Pool:
             'type': self.APPLY_TYPE,
             'action': action
         }
-        for old_key, next_key in action:
-            old_cell = self.cells[old_key]
-            side = old_cell['content']
-            old_cell['content'] = None
-            if not next_key:
-                if side == CMP_SIDE:
+
+        # Составляющие оценки обновляются только для ячеек, затронутых ходом. Прежние значения сохраняются в стек,
+        # поэтому при откате хода их не нужно пересчитывать
+        self.rates_stack.append(self.rates)
+        self.hash_stack.append(self.hash)
+        rates = list(self.rates)
+        position_hash = self.hash
+        cell_bits = self.CELL_BITS
+        for old_index, next_index in self.ACTION_STEPS[action]:
+            old_bit = cell_bits[old_index]
+            if self.cmp_board & old_bit:
+                self._change_rates(rates, old_index, True, -1)
+                self.cmp_board ^= old_bit
+                position_hash ^= self.ZOBRIST_CMP_KEYS[old_index]
+                if next_index is not None:
+                    self.cmp_board |= cell_bits[next_index]
+                    position_hash ^= self.ZOBRIST_CMP_KEYS[next_index]
+                    self._change_rates(rates, next_index, True, 1)
+                else:
                     self.cmp_balls_count -= 1
-                if side == PLAYER_SIDE:
+            elif self.player_board & old_bit:
+                self._change_rates(rates, old_index, False, -1)
+                self.player_board ^= old_bit
+                position_hash ^= self.ZOBRIST_PLAYER_KEYS[old_index]
+                if next_index is not None:
+                    self.player_board |= cell_bits[next_index]
+                    position_hash ^= self.ZOBRIST_PLAYER_KEYS[next_index]
+                    self._change_rates(rates, next_index, False, 1)
+                else:
                     self.player_balls_count -= 1
-                continue
+        self.rates = rates
 
-            next_cell = self.cells[next_key]
-            next_cell['content'] = side
+        # Кроме расстановки шариков в хэш входят очередь хода и этап партии (от него зависит оценка позиции)
+        position_hash ^= self.ZOBRIST_SIDE_KEY
+        phase_key = self.ZOBRIST_PHASE_KEYS.get(len(self.actions))
+        if phase_key:
+            position_hash ^= phase_key
+        self.hash = position_hash
 
     def cancel_action(self):
         action = self.actions.pop()
+        self.rates = self.rates_stack.pop()
+        self.hash = self.hash_stack.pop()
         self.last_action_description = {
             'type': self.CANCEL_TYPE,
             'action': action
         }
-        for index, (old_key, next_key) in enumerate(reversed(action)):
-            if index == 0:
-                other_side = self.OTHER_SIDE_DICT[self.cells[next_key]['content']]
-
-            if next_key:
-                side = self.cells[next_key]['content']
-                self.cells[next_key]['content'] = None
-                self.cells[old_key]['content'] = side
+        cell_bits = self.CELL_BITS
+        for number, (old_index, next_index) in enumerate(reversed(self.ACTION_STEPS[action])):
+            if number == 0:
+                # Первым откатывается последний шарик сходившей стороны - по нему определяем сторону противника
+                other_side = PLAYER_SIDE if self.cmp_board & cell_bits[next_index] else CMP_SIDE
+
+            old_bit = cell_bits[old_index]
+            if next_index is not None:
+                next_bit = cell_bits[next_index]
+                if self.cmp_board & next_bit:
+                    self.cmp_board ^= next_bit | old_bit
+                else:
+                    self.player_board ^= next_bit | old_bit
             else:
-                self.cells[old_key]['content'] = other_side
                 if other_side == CMP_SIDE:
+                    self.cmp_board |= old_bit
                     self.cmp_balls_count += 1
                 if other_side == PLAYER_SIDE:
+                    self.player_board |= old_bit
                     self.player_balls_count += 1
 
+    def get_phase_depth(self):
+        """
+        Метод возвращает, на сколько ходов вперед от текущей позиции сохраняется этап партии (этапы сменяются
+        на ходах из ZOBRIST_PHASE_KEYS). Оценка перебора на бОльшую глубину зависит от того, на каком ходу сменится
+        этап, а номер хода в хэш позиции не входит - такую оценку нельзя переносить на ту же позицию на другом ходу
+        """
+
+        actions_count = len(self.actions)
+        for phase_count in self.ZOBRIST_PHASE_KEYS:
+            if actions_count < phase_count:
+                return phase_count - 1 - actions_count
+        return float('inf')
+
     def get_rating(self):
         # Первый этап оценки рейтинга - оценка количества шариков
-        cmp_count_rate = (self.cmp_balls_count ** 2) * 1900
-        player_count_rate = (self.player_balls_count ** 2) * 1900
+        count_rate = (self.cmp_balls_count ** 2 - self.player_balls_count ** 2) * RATING_COUNT_WEIGHT
 
         # Второй этап оценки рейтинга - оценка близости шариков к центру доски и стороне противника
-        cmp_pos_rate = 0
-        player_pos_rate = 0
-        factor_a = 8
+        factor_a = RATING_A_FACTORS[0]
         actions_count = len(self.actions)
         if 21 <= actions_count <= 45:
-            factor_a = 6
+            factor_a = RATING_A_FACTORS[1]
         if actions_count > 45:
-            factor_a = 2
-        full_cells = self._get_cells_with_content()
-        for (a, b, c), cell in full_cells.items():
-            content = cell['content']
-            if content == PLAYER_SIDE:
-                player_pos_rate += (8 - abs(a) + abs(b) + abs(c)) * 2
-                player_pos_rate += a * factor_a
-            if content == CMP_SIDE:
-                cmp_pos_rate += (8 - abs(a) + abs(b) + abs(c)) * 2
-                cmp_pos_rate += (-1) * a * factor_a
-
-        # Третий этап - оценка прикрытий
-        cmp_cover_rate = 0
-        player_cover_rate = 0
-        for (a, b, c), cell in full_cells.items():
-            side = cell['content']
-            for da, db, dc in self.SHORT_DELTA_KEYS:
-                # Проверяем первую соседнюю ячейку
-                n_key = a + da, b + db, c + dc
-                n_cell = full_cells.get(n_key)
-                if n_cell and n_cell['content'] == side:
-                    score = 1
-                else:
-                    continue
+            factor_a = RATING_A_FACTORS[2]
+        cmp_dist_rate, player_dist_rate, cmp_a_sum, player_a_sum, \
+            cmp_cover_rate, player_cover_rate, cmp_drop_count, player_drop_count = self.rates
+        pos_rate = (cmp_dist_rate - player_dist_rate) * RATING_DIST_WEIGHT - (cmp_a_sum + player_a_sum) * factor_a
 
-                n_key = a + 2 * da, b + 2 * db, c + 2 * dc
-                n_cell = full_cells.get(n_key)
-                if n_cell and n_cell['content'] == side:
-                    score += 2
-
-                if side == CMP_SIDE:
-                    cmp_cover_rate += score ** 2
-                if side == PLAYER_SIDE:
-                    player_cover_rate += score ** 2
-
-        # Четвертый этап - проверка наличия выталкивающих ходов
-        cmp_drop_count = 0
-        player_drop_count = 0
-        for pattern in self.drop_patterns:
-            side = self.cells[pattern[0]]['content']
-            if not side:
-                continue
-            other_side = self.OTHER_SIDE_DICT[side]
-            if len(pattern) == 3:
-                etalon = [side, other_side, other_side]
-            else:
-                etalon = [side, side, other_side, other_side, other_side]
-            for index, key in enumerate(pattern[1:], 1):
-                content = self.cells[key]['content']
-                if content != etalon[index]:
-                    break
-            else:
-                if side == CMP_SIDE:
-                    player_drop_count += 1
-                if side == PLAYER_SIDE:
-                    cmp_drop_count += 1
-        cmp_drop_rate = (cmp_drop_count ** 2) * 600
-        player_drop_rate = (player_drop_count ** 2) * 600
-
-        cmp_rate = cmp_count_rate + cmp_pos_rate + cmp_cover_rate + cmp_drop_rate
-        player_rate = player_count_rate + player_pos_rate + player_cover_rate + player_drop_rate
-        total_rate = cmp_rate - player_rate
+        # Третий и четвертый этапы - оценка прикрытий и наличия выталкивающих ходов
+        cover_rate = (cmp_cover_rate - player_cover_rate) * RATING_COVER_WEIGHT
+        drop_rate = (cmp_drop_count ** 2 - player_drop_count ** 2) * RATING_DROP_WEIGHT
+
+        total_rate = count_rate + pos_rate + cover_rate + drop_rate
         return total_rate
 
+    def _create_rates(self):
+        """
+        Метод полностью пересчитывает накапливаемые составляющие оценки позиции. Возвращает список
+        [расстояния компьютера, расстояния игрока, сумма a компьютера, сумма a игрока,
+        прикрытия компьютера, прикрытия игрока, выталкивающие ходы компьютера, выталкивающие ходы игрока]
+        """
+
+        cmp_board = self.cmp_board
+        player_board = self.player_board
+
+        # Близость шариков к центру доски (расстояния) и к стороне противника (координата a)
+        rates = [0] * 8
+        dist_rates = self.DIST_RATES
+        a_values = self.A_VALUES
+        pos_indices = self.POS_INDICES
+        for index, board in enumerate((cmp_board, player_board)):
+            while board:
+                low = board & -board
+                cell_index = pos_indices[low.bit_length() - 1]
+                rates[index] += dist_rates[cell_index]
+                rates[index + 2] += a_values[cell_index]
+                board ^= low
+
+        # Прикрытия. Пара соседних шариков дает 1 очко, тройка в линию - еще 8 (в сумме 3 ** 2)
+        for shift in self.BIT_SHIFTS[:3]:
+            pairs = cmp_board & (cmp_board >> shift)
+            rates[4] += bin(pairs).count('1') + 8 * bin(cmp_board & (pairs >> shift)).count('1')
+            pairs = player_board & (player_board >> shift)
+            rates[5] += bin(pairs).count('1') + 8 * bin(player_board & (pairs >> shift)).count('1')
+
+        # Выталкивающие ходы: шарик (или два) на краевом кольце, за которыми по направлению от края
+        # стоят два (или три) шарика противника
+        ring_mask = self.RING_MASK
+        for shift in self.BIT_SHIFTS:
+            rs, ls = (shift, 0) if shift > 0 else (0, -shift)
+
+            # Компьютер может вытолкнуть шарик игрока
+            pushers = cmp_board & ((cmp_board >> rs) << ls)
+            victims = player_board & ((pushers >> rs) << ls)
+            rates[6] += bin(ring_mask & victims).count('1')
+            pushers = cmp_board & ((pushers >> rs) << ls)
+            victims = player_board & ((player_board & ((pushers >> rs) << ls)) >> rs << ls)
+            rates[6] += bin(ring_mask & victims).count('1')
+
+            # Игрок может вытолкнуть шарик компьютера
+            pushers = player_board & ((player_board >> rs) << ls)
+            victims = cmp_board & ((pushers >> rs) << ls)
+            rates[7] += bin(ring_mask & victims).count('1')
+            pushers = player_board & ((pushers >> rs) << ls)
+            victims = cmp_board & ((cmp_board & ((pushers >> rs) << ls)) >> rs << ls)
+            rates[7] += bin(ring_mask & victims).count('1')
+
+        return rates
+
+    def _create_hash(self):
+        """ Метод полностью пересчитывает хэш позиции по Зобристу """
+
+        result = 0
+        for index, bit in enumerate(self.CELL_BITS):
+            if self.cmp_board & bit:
+                result ^= self.ZOBRIST_CMP_KEYS[index]
+            if self.player_board & bit:
+                result ^= self.ZOBRIST_PLAYER_KEYS[index]
+        if len(self.actions) % 2:
+            result ^= self.ZOBRIST_SIDE_KEY
+        for actions_count, phase_key in self.ZOBRIST_PHASE_KEYS.items():
+            if len(self.actions) >= actions_count:
+                result ^= phase_key
+        return result
+
+    def _change_rates(self, rates, index, is_cmp, sign):
+        """
+        Метод добавляет (sign=1) или вычитает (sign=-1) из накапливаемых составляющих оценки вклад шарика в ячейке
+        с номером index. Шарик в момент вызова должен стоять на доске
+        """
+
+        if is_cmp:
+            own, other, own_index = self.cmp_board, self.player_board, 0
+        else:
+            own, other, own_index = self.player_board, self.cmp_board, 1
+
+        # Прикрытия, в которых участвует шарик
+        cover = 0
+        for next_bit, next_bit_2, prev_bit, prev_bit_2 in self.COVER_NEIGHBOURS[index]:
+            has_next = own & next_bit
+            if has_next:
+                cover += 9 if own & next_bit_2 else 1
+            if own & prev_bit:
+                cover += 9 if own & prev_bit_2 else 1
+                if has_next:
+                    cover += 8
+
+        # Выталкивающие ходы, в которых шарик - жертва (считаются противнику) или толкатель (считаются его стороне)
+        own_drop = 0
+        other_drop = 0
+        for victim_mask, pusher_mask in self.DROP_VICTIM_PATTERNS[index]:
+            if (own & victim_mask) == victim_mask and (other & pusher_mask) == pusher_mask:
+                other_drop += 1
+        for victim_mask, pusher_mask in self.DROP_PUSHER_PATTERNS[index]:
+            if (own & pusher_mask) == pusher_mask and (other & victim_mask) == victim_mask:
+                own_drop += 1
+
+        rates[own_index] += sign * self.DIST_RATES[index]
+        rates[own_index + 2] += sign * self.A_VALUES[index]
+        rates[own_index + 4] += sign * cover
+        rates[own_index + 6] += sign * own_drop
+        rates[7 - own_index] += sign * other_drop
+
     def get_last_action_description(self):
         if self.last_action_description:
             return self.last_action_description
@@ -236,7 +699,7 @@ class Pool:
                     if a == 4 or a == 3 or (a == 2 and b in [0, -1, -2]):
                         result.append((a, b, c))
 
-        return set(result) & set(self.cells.keys())
+        return set(result) & set(self.KEYS)
 
     def _get_player_init_data(self):
         result = []
@@ -246,107 +709,130 @@ class Pool:
                     if a == -4 or a == -3 or (a == -2 and b in [0, 1, 2]):
                         result.append((a, b, c))
 
-        return set(result) & set(self.cells.keys())
+        return set(result) & set(self.KEYS)
 
-    def _create_shift_actions(self, side):
-        cells_side = self._get_cells_with_content(side)
-        result = []
+    def _get_boards(self, side):
+        if side == CMP_SIDE:
+            return self.cmp_board, self.player_board
+        return self.player_board, self.cmp_board
 
-        # Внешний цикл - перебор длин цепочки
-        for count in range(3, 0, -1):
-            if count == 1:
-                for key, cell in cells_side.items():
-                    for n_key in cell['around']:
-                        if not n_key or self.cells[n_key]['content']:
-                            continue
-                        result.append([(key, n_key)])
-            else:
-                # Создаем группы ячеек
-                groups = []
-                for a, b, c in cells_side:
-                    for direction, (da, db, dc) in enumerate(self.SHORT_DELTA_KEYS):
-                        group_keys = [(a, b, c), (a + da, b + db, c + dc)]
-                        if count == 3:
-                            group_keys.append((a + 2 * da, b + 2 * db, c + 2 * dc))
-
-                        for group_key in group_keys:
-                            key_cell = self.cells.get(group_key)
-                            if not key_cell or key_cell['content']:
-                                break
-                        else:
-                            groups.append({
-                                'directions': [direction, direction + 3],
-                                'keys': group_keys
-                            })
-
-                # Проверяем каждую группу на возможность сдвига. Если она есть - фиксируем соответствующие операции
-                for group in groups:
-                    directions = group['directions']
-                    keys = group['keys']
-
-                    for direction, (da, db, dc) in enumerate(self.DELTA_KEYS):
-                        if direction in directions:
-                            continue
+    def _create_shift_actions(self, side):
+        own, other = self._get_boards(side)
+        empty = self.BOARD_MASK ^ own ^ other
+
+        # Для каждого направления находим шарики, которые могут на него сдвинуться
+        movable = []
+        for shift in self.BIT_SHIFTS:
+            rs, ls = (shift, 0) if shift > 0 else (0, -shift)
+            movable.append(own & ((empty >> rs) << ls))
+
+        result = array('I')
+
+        # Внешний цикл - перебор длин цепочки. Группа из двух-трех шариков сдвигается целиком,
+        # если каждый её шарик может сдвинуться в нужном направлении
+        for count in (3, 2):
+            for axis, axis_shift in enumerate(self.BIT_SHIFTS[:3]):
+                for direction in range(6):
+                    if direction == axis or direction == axis + 3:
+                        continue
+
+                    starts = movable[direction]
+                    groups = starts & (starts >> axis_shift)
+                    if count == 3:
+                        groups = starts & (groups >> axis_shift)
+
+                    table = self.SHIFT_ACTIONS[(count, axis, direction)]
+                    while groups:
+                        low = groups & -groups
+                        result.append(table[low.bit_length() - 1])
+                        groups ^= low
 
-                        action = []
-                        for a, b, c in keys:
-                            na = a + da,
-                            nb = b + db
-                            nc = c + dc
-                            n_cell = self.cells.get((na, nb, nc))
-                            if not n_cell or n_cell['content']:
-                                break
-                            action.append(((a, b, c), (na, nb, nc)))
-                        else:
-                            result.append(action)
+        for direction in range(6):
+            starts = movable[direction]
+            table = self.SINGLE_ACTIONS[direction]
+            while starts:
+                low = starts & -starts
+                result.append(table[low.bit_length() - 1])
+                starts ^= low
 
         return result
 
     def _create_line_actions(self, side):
-        cells_side = self._get_cells_with_content(side)
-        other_side = self.OTHER_SIDE_DICT[side]
+        return self._create_drop_actions(side) + self._create_push_actions(side) + self._create_inline_actions(side)
 
-        # Формируем группы ячеек и паттерны для них
-        groups = []
-        for direction in range(6):
-            for key in cells_side:
-                group_keys = [key]
-                pattern = ''
-                while True:
-                    last_key = group_keys[-1]
-                    if last_key is None:
-                        pattern += 'r'
-                        break
-                    content = self.cells[last_key]['content']
-                    if content == side:
-                        pattern += '*'
-                    elif content == other_side:
-                        pattern += '#'
-                    elif content is None:
-                        pattern += 'e'
-                        break
-
-                    group_keys.append(self.cells[last_key]['around'][direction])
-
-                if pattern in self.LINE_PATTERNS_SET:
-                    groups.append((pattern, group_keys))
-
-        # Сортируем группы по важности хода
-        groups.sort(key=lambda x: self.LINE_PATTERNS.index(x[0]))
-
-        # Строим итоговый список ходов
-        result = []
-        for group in groups:
-            actions = []
-            keys = group[1]
-            for index in range(len(keys) - 1, 0, -1):
-                actions.append((keys[index - 1], keys[index]))
-            result.append(actions)
+    def _create_drop_actions(self, side):
+        """ Метод возвращает выталкивающие ходы (паттерны, оканчивающиеся краем доски) """
 
-        return result
+        own, other = self._get_boards(side)
 
-    def _get_cells_with_content(self, side=None):
-        if side:
-            return {key: cell for key, cell in self.cells.items() if cell['content'] == side}
-        else:
-            return {key: cell for key, cell in self.cells.items() if cell['content']}
+        # Для каждого паттерна формируем маски ячеек, с которых он начинается. Паттерн читается от хвоста группы
+        # по направлению хода: * - свой шарик, # - чужой, e - пусто, r - край доски
+        groups = [array('I'), array('I'), array('I')]
+        for direction, shift in enumerate(self.BIT_SHIFTS):
+            rs, ls = (shift, 0) if shift > 0 else (0, -shift)
+
+            other_r = other & self.EDGE_MASKS[direction]
+            if not other_r:
+                continue
+            other2_r = other & ((other_r >> rs) << ls)
+
+            own2_other_r = own & ((own & ((other_r >> rs) << ls)) >> rs << ls)
+            own3_other_r = own & ((own2_other_r >> rs) << ls)
+            own3_other2_r = own & ((own & ((own & ((other2_r >> rs) << ls)) >> rs << ls)) >> rs << ls)
+
+            self._add_line_actions(groups, 0, direction, (own2_other_r, own3_other_r, own3_other2_r))
+
+        return groups[0] + groups[1] + groups[2]
+
+    def _create_push_actions(self, side):
+        """ Метод возвращает ходы, толкающие чужие шарики без выталкивания """
+
+        own, other = self._get_boards(side)
+        empty = self.BOARD_MASK ^ own ^ other
+
+        groups = [array('I'), array('I'), array('I')]
+        for direction, shift in enumerate(self.BIT_SHIFTS):
+            rs, ls = (shift, 0) if shift > 0 else (0, -shift)
+
+            other_e = other & ((empty >> rs) << ls)
+            if not other_e:
+                continue
+            other2_e = other & ((other_e >> rs) << ls)
+
+            own2_other_e = own & ((own & ((other_e >> rs) << ls)) >> rs << ls)
+            own3_other_e = own & ((own2_other_e >> rs) << ls)
+            own3_other2_e = own & ((own & ((own & ((other2_e >> rs) << ls)) >> rs << ls)) >> rs << ls)
+
+            self._add_line_actions(groups, 3, direction, (own3_other2_e, own3_other_e, own2_other_e))
+
+        return groups[0] + groups[1] + groups[2]
+
+    def _create_inline_actions(self, side):
+        """ Метод возвращает линейные ходы групп из двух-трех шариков в пустую ячейку """
+
+        own, other = self._get_boards(side)
+        empty = self.BOARD_MASK ^ own ^ other
+
+        groups = [array('I'), array('I')]
+        for direction, shift in enumerate(self.BIT_SHIFTS):
+            rs, ls = (shift, 0) if shift > 0 else (0, -shift)
+
+            own_e = own & ((empty >> rs) << ls)
+            own2_e = own & ((own_e >> rs) << ls)
+            own3_e = own & ((own2_e >> rs) << ls)
+
+            self._add_line_actions(groups, 6, direction, (own3_e, own2_e))
+
+        return groups[0] + groups[1]
+
+    def _add_line_actions(self, groups, first_pattern, direction, masks):
+        # Ходы каждого паттерна собираются в свою группу, чтобы внутри этапа они шли в порядке важности паттернов
+        for number, mask in enumerate(masks):
+            if not mask:
+                continue
+            table = self.LINE_ACTIONS[direction][first_pattern + number]
+            group = groups[number]
+            while mask:
+                low = mask & -mask
+                group.append(table[low.bit_length() - 1])
+                mask ^= low
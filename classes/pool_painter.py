@@ -1,6 +1,5 @@
 import os
-from copy import deepcopy
-from math import pi, cos, sin
+from math import pi, cos, sin, floor, ceil
 from settings import W, H, RADIUS, CELLS_MARGIN, CMP_SIDE, PLAYER_SIDE
 from .pool import Pool
 
@@ -26,8 +25,18 @@ class PoolPainter:
 
     TRANSPARENT_COLOR = (127,) * 3
 
+    # Кэш спрайтов шариков, общий для процесса: исходные изображения по меткам цвета и готовые поверхности
+    # по паре (метка цвета, размер)
+    BALL_IMAGES = {}
+    BALL_SURFACES = {}
+
     BALL_SIZE = int(BALL_SCALE_FACTOR * RADIUS * cos(pi / 6))
 
+    # Центр поля и смещения по экрану при шаге на единицу по координатам a и b ключа ячейки (см. DIRECTIONS)
+    X_CENTER, Y_CENTER = W // 2, H // 2
+    A_STEP = 2 * sin(pi / 3) * (RADIUS * cos(pi / 6))
+    B_STEP = 2 * (RADIUS * cos(pi / 6))
+
     class MoveAnimation:
         """ Класс для создания анимаций перемещения шариков """
 
@@ -40,17 +49,20 @@ class PoolPainter:
             dx, dy = (x2 - x1) / self.STEP_COUNT, (y2 - y1) / self.STEP_COUNT
             self.steps = [(x1 + dx * index, y1 + dy * index) for index in range(self.STEP_COUNT)]
             self.steps.append(end_pos)
-            self.ball_surface = pool_painter.create_ball_surface(side)
+            self.ball_surface = pool_painter.get_ball_surface(side)
             self.callback = callback
 
         def animate(self):
+            """ Метод делает следующий шаг анимации и возвращает кадр: поверхность шарика и ее координаты """
+
             x, y = self.steps.pop(0)
             x, y = int(x - self.pool_painter.BALL_SIZE // 2), int(y - self.pool_painter.BALL_SIZE // 2)
-            self.pool_painter.balls_surface.blit(self.ball_surface, (x, y))
 
             if not self.steps:
                 self.callback()
 
+            return self.ball_surface, (x, y)
+
         def has_animate(self):
             return len(self.steps) > 0
 
@@ -65,27 +77,31 @@ class PoolPainter:
         def __init__(self, pool_painter, pos, side, animation_type, callback=None):
             self.pool_painter = pool_painter
             self.pos = pos
-            self.ball_surface = pool_painter.create_ball_surface(side)
+            self.side = side
             self.callback = callback
-            self.steps = [
-                pool_painter.BALL_SIZE * (1 - (1 / self.STEP_COUNT) * index) for index in range(1, self.STEP_COUNT)
-            ]
+            self.steps = self.create_sizes(pool_painter.BALL_SIZE)
             if animation_type == self.CREATE_TYPE:
                 self.steps.reverse()
 
+        @classmethod
+        def create_sizes(cls, ball_size):
+            """ Метод возвращает размеры шарика на шагах анимации исчезновения """
+
+            return [int(ball_size * (1 - (1 / cls.STEP_COUNT) * index)) for index in range(1, cls.STEP_COUNT)]
+
         def animate(self):
-            if not self.steps:
-                return
+            """ Метод делает следующий шаг анимации и возвращает кадр: поверхность шарика и ее координаты """
 
             step = self.steps.pop(0)
-            self.ball_surface = self.pool_painter.pg.transform.scale(self.ball_surface, (int(step),) * 2)
+            self.ball_surface = self.pool_painter.get_ball_surface(self.side, step)
             x, y = self.pos
-            x, y = x - self.ball_surface.get_width() // 2, y - self.ball_surface.get_height() // 2
-            self.pool_painter.balls_surface.blit(self.ball_surface, (x, y))
+            x, y = int(x - self.ball_surface.get_width() // 2), int(y - self.ball_surface.get_height() // 2)
 
             if not self.steps and self.callback:
                 self.callback()
 
+            return self.ball_surface, (x, y)
+
         def has_animate(self):
             return len(self.steps) > 0
 
@@ -96,13 +112,17 @@ class PoolPainter:
         self.cmp_color_label = cmp_color_label
         self.player_color_label = player_color_label
 
-        # Готовим списки ячеек и их координат
-        self.cells = deepcopy(pool.cells)
+        # Снимок доски в том виде, в котором она показана на экране (во время анимаций он отстает от пула),
+        # и координаты ячеек
+        self.snapshot = pool.get_snapshot()
         self.cells_coord = self._create_cell_coords()
 
-        # Загружаем спрайты с красными и синими шариками
-        self.cmp_ball_surface = self.create_ball_surface(CMP_SIDE)
-        self.player_ball_surface = self.create_ball_surface(PLAYER_SIDE)
+        # Загружаем спрайты с красными и синими шариками и заранее готовим кадры анимаций появления и исчезновения
+        self.cmp_ball_surface = self.get_ball_surface(CMP_SIDE)
+        self.player_ball_surface = self.get_ball_surface(PLAYER_SIDE)
+        for side in (CMP_SIDE, PLAYER_SIDE):
+            for size in self.ScaleAnimation.create_sizes(self.BALL_SIZE):
+                self.get_ball_surface(side, size)
 
         # Готовим поверхности для отрисовки ячеек и шариков
         self.cells_surface = pg.Surface((W, H))
@@ -113,9 +133,9 @@ class PoolPainter:
         self.balls_surface.set_colorkey(self.TRANSPARENT_COLOR)
         self.balls_surface.fill(self.TRANSPARENT_COLOR)
 
-        # Флаги необходимости перерисовки
-        self.redraw_cells_flag = True
-        self.redraw_balls_flag = True
+        # Ключи ячеек, которые нужно перерисовать: отдельно гексы и шарики в них. Сначала перерисовывается все поле
+        self.redraw_cell_keys = set(Pool.KEYS)
+        self.redraw_ball_keys = set(Pool.KEYS)
 
         # Ключ ячейки под курсором
         self.key_cell_at_cursor = None
@@ -123,20 +143,49 @@ class PoolPainter:
         # Ключи выделенной группы
         self.group = set()
 
-        # Список анимаций
+        # Список анимаций и кадры, показанные ими на текущем шаге. Анимированные шарики не рисуются на поверхности
+        # шариков, а накладываются поверх нее при выводе
         self.animations = []
+        self.frames = []
 
     def _create_cell_coords(self):
-        """Метод создает координаты ячеек игрового поля по их ключам"""
+        """
+        Метод создает координаты ячеек игрового поля по их ключам. Кроме центра и контура гекса для ячейки
+        запоминаются прямоугольник шарика и прямоугольник, который нужно обновить на экране при перерисовке ячейки
+        """
 
         result = {}
-        for key, cell in self.cells.items():
+        for key in Pool.KEYS:
             center = self._create_hexagon_center(key)
             coords = self._create_hexagon_coords(center)
+            xs, ys = [x for x, _ in coords], [y for _, y in coords]
+            cell_rect = self.pg.Rect(
+                floor(min(xs)),
+                floor(min(ys)),
+                ceil(max(xs)) - floor(min(xs)) + 1,
+                ceil(max(ys)) - floor(min(ys)) + 1
+            )
+            ball_rect = self.pg.Rect(
+                int(center[0] - self.BALL_SIZE // 2),
+                int(center[1] - self.BALL_SIZE // 2),
+                self.BALL_SIZE + 1,
+                self.BALL_SIZE + 1
+            )
+
+            # Коэффициенты уравнений прямых, на которых лежат стороны контура, и знак, который дает центр гекса
+            edges = []
+            for (x1, y1), (x2, y2) in zip(coords, coords[1:] + coords[:1]):
+                factor_a, factor_b, factor_c = y2 - y1, x1 - x2, y1 * (x2 - x1) - x1 * (y2 - y1)
+                center_val = self._normalize_value(factor_a * center[0] + factor_b * center[1] + factor_c)
+                edges.append((factor_a, factor_b, factor_c, center_val))
+
             result[key] = {
                 'x0': center[0],
                 'y0': center[1],
-                'coords': coords
+                'coords': coords,
+                'edges': edges,
+                'ball_rect': ball_rect,
+                'rect': cell_rect.union(ball_rect)
             }
 
         return result
@@ -145,7 +194,7 @@ class PoolPainter:
         """Метод возвращает координаты центра гекса по переданному ключу"""
 
         a, b, _ = key
-        x0, y0 = W // 2, H // 2
+        x0, y0 = self.X_CENTER, self.Y_CENTER
 
         dx, dy = self.DIRECTIONS[1]
         x0 += (dx * a)
@@ -213,55 +262,86 @@ class PoolPainter:
             return 1
         return value
 
-    def create_ball_surface(self, side):
-        base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        images_dir = os.path.join(base_dir, 'images')
+    def get_ball_surface(self, side, size=None):
+        """
+        Метод возвращает поверхность шарика стороны side размером size (по умолчанию - BALL_SIZE). Поверхности берутся
+        из общего для процесса кэша: каждое изображение читается с диска один раз, а каждый размер масштабируется
+        один раз из исходного изображения
+        """
+
         if side == CMP_SIDE:
-            surface = self.pg.image.load(os.path.join(images_dir, f'ball_{self.cmp_color_label}.png'))
+            color_label = self.cmp_color_label
         if side == PLAYER_SIDE:
-            surface = self.pg.image.load(os.path.join(images_dir, f'ball_{self.player_color_label}.png'))
-        surface = self.pg.transform.scale(surface, (self.BALL_SIZE,) * 2)
+            color_label = self.player_color_label
+        size = size or self.BALL_SIZE
+
+        surface = self.BALL_SURFACES.get((color_label, size))
+        if surface is None:
+            image = self.BALL_IMAGES.get(color_label)
+            if image is None:
+                base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+                images_dir = os.path.join(base_dir, 'images')
+                image = self.pg.image.load(os.path.join(images_dir, f'ball_{color_label}.png')).convert_alpha()
+                self.BALL_IMAGES[color_label] = image
+            surface = self.pg.transform.scale(image, (size,) * 2)
+            self.BALL_SURFACES[(color_label, size)] = surface
+
         return surface
 
+    def get_content(self, key):
+        """ Метод возвращает сторону, шарик которой показан в ячейке key, или None, если ячейка пуста """
+
+        return self.snapshot.get_content(Pool.KEY_BITS[key])
+
+    def _set_content(self, key, side):
+        self.snapshot = self.snapshot.set_content(Pool.KEY_BITS[key], side)
+        self.redraw_ball_keys.add(key)
+
     def get_key_at_dot(self, dot):
         """
         Метод возвращает ключ ячейки, в которую попадает переданная точка.
         Если переданная точка не попадает ни в одну ячейку - возвращает None
         """
 
+        # Переводим точку в координаты (a, b) ключей и округляем их до ближайшего центра ячейки. Контур гекса лежит
+        # внутри области точек, ближайших к его центру, поэтому проверять точку нужно только для этой ячейки
         x, y = dot
-        for key, cell_coord in self.cells_coord.items():
-            x0 = cell_coord['x0']
-            y0 = cell_coord['y0']
-            coords = cell_coord['coords']
-            tmp_coords = coords + [coords[0]]
-            len_tmp_coords = len(tmp_coords)
-            for (x1, y1), (x2, y2) in ((tmp_coords[i], tmp_coords[i + 1]) for i in range(len_tmp_coords - 1)):
-                factor_a, factor_b, factor_c = y2 - y1, x1 - x2, y1 * (x2 - x1) - x1 * (y2 - y1)
-                dot_val = self._normalize_value(factor_a * x + factor_b * y + factor_c)
-                if dot_val == 0:
-                    return key
-
-                center_val = self._normalize_value(factor_a * x0 + factor_b * y0 + factor_c)
-                if dot_val != center_val:
-                    break
-
-            else:
+        a = (self.Y_CENTER - y) / self.A_STEP
+        b = (x - self.X_CENTER) / self.B_STEP - a / 2
+        c = -a - b
+        round_a, round_b, round_c = round(a), round(b), round(c)
+        delta_a, delta_b, delta_c = abs(round_a - a), abs(round_b - b), abs(round_c - c)
+        if delta_a > delta_b and delta_a > delta_c:
+            round_a = -round_b - round_c
+        elif delta_b > delta_c:
+            round_b = -round_a - round_c
+
+        key = round_a, round_b, round_a + round_b
+        cell_coord = self.cells_coord.get(key)
+        if cell_coord is None:
+            return None
+
+        # Точка должна лежать по ту же сторону от каждой стороны контура, что и центр гекса (или на самой стороне)
+        for factor_a, factor_b, factor_c, center_val in cell_coord['edges']:
+            dot_val = self._normalize_value(factor_a * x + factor_b * y + factor_c)
+            if dot_val == 0:
                 return key
+            if dot_val != center_val:
+                return None
 
-        return None
+        return key
 
     def set_cursor_pos(self, pos):
         key = self.get_key_at_dot(pos)
         if key != self.key_cell_at_cursor:
+            self.redraw_cell_keys.update({key, self.key_cell_at_cursor} - {None})
             self.key_cell_at_cursor = key
-            self.redraw_cells_flag = True
 
     def set_group(self, group):
         tmp_group = set(group)
         if tmp_group != self.group:
+            self.redraw_cell_keys.update(tmp_group ^ self.group)
             self.group = tmp_group
-            self.redraw_cells_flag = True
 
     def refresh_pool(self):
         """ Метод обновляет текущий вид доски на экране в соотвтетствие с последним ходом в пуле """
@@ -269,13 +349,13 @@ class PoolPainter:
         def create_move_animation(start_key, end_key, side_key, callback_key):
             _start_pos = self.cells_coord[start_key]['x0'], self.cells_coord[start_key]['y0']
             _end_pos = self.cells_coord[end_key]['x0'], self.cells_coord[end_key]['y0']
-            _side = self.cells[side_key]['content']
+            _side = self.get_content(side_key)
             _callback = create_animation_callback(callback_key, _side)
             return self.MoveAnimation(self, _start_pos, _end_pos, _side, _callback)
 
         def create_animation_callback(key, _side):
             def inner():
-                self.cells[key]['content'] = _side
+                self._set_content(key, _side)
 
             return inner
 
@@ -284,7 +364,7 @@ class PoolPainter:
             return
 
         action_type = last_action_description['type']
-        action = last_action_description['action']
+        action = Pool.decode_action(last_action_description['action'])
 
         # Анимируем обычный ход
         if action_type == Pool.APPLY_TYPE:
@@ -296,16 +376,16 @@ class PoolPainter:
                 else:
                     # Создаем анимацию удаления шарика
                     pos = self.cells_coord[old_key]['x0'], self.cells_coord[old_key]['y0']
-                    side = self.cells[old_key]['content']
+                    side = self.get_content(old_key)
                     self.animations.append(self.ScaleAnimation(self, pos, side, self.ScaleAnimation.REMOVE_TYPE))
 
-                self.cells[old_key]['content'] = None
+                self._set_content(old_key, None)
 
         # Анимируем откат
         if action_type == Pool.CANCEL_TYPE:
             for index, (old_key, next_key) in enumerate(reversed(action)):
                 if index == 0:
-                    other_side = {CMP_SIDE: PLAYER_SIDE, PLAYER_SIDE: CMP_SIDE}[self.cells[next_key]['content']]
+                    other_side = {CMP_SIDE: PLAYER_SIDE, PLAYER_SIDE: CMP_SIDE}[self.get_content(next_key)]
                 if next_key:
                     # Создаем анимацию перемещения шарика
                     move_animation = create_move_animation(next_key, old_key, next_key, old_key)
@@ -319,57 +399,75 @@ class PoolPainter:
                     )
 
                 if next_key:
-                    self.cells[next_key]['content'] = None
-
-        self.redraw_balls_flag = True
+                    self._set_content(next_key, None)
 
     @property
     def has_animate(self):
         return len(self.animations) > 0
 
-    def draw(self):
-        # Отрисовываем гексы
-        if self.redraw_cells_flag:
-            self.cells_surface.fill(self.TRANSPARENT_COLOR)
-            for key, cell_coord in self.cells_coord.items():
-                coords = cell_coord['coords']
-                color = self.CELL_BACKGROUND_COLOR
-
-                if key == self.key_cell_at_cursor:
-                    color = self.CELL_AT_CURSOR_COLOR
-                if key in self.group:
-                    color = self.CELL_GROUP_COLOR
-
-                self.pg.draw.polygon(self.cells_surface, color, coords)
-                self.pg.draw.polygon(self.cells_surface, self.CELL_BORDER_COLOR, coords, 1)
-
-            self.redraw_cells_flag = False
-
-        # Отрисовываем шарики
-        if self.redraw_balls_flag:
-            self.balls_surface.fill(self.TRANSPARENT_COLOR)
-            for key, cell in self.cells.items():
-                ball = cell['content']
-                if not ball:
-                    continue
-
-                ball_surface = None
-                if ball == CMP_SIDE:
-                    ball_surface = self.cmp_ball_surface
-                if ball == PLAYER_SIDE:
-                    ball_surface = self.player_ball_surface
+    @property
+    def has_frames(self):
+        """ Признак того, что на экране остались кадры анимаций, которые нужно стереть на следующем шаге """
 
+        return len(self.frames) > 0
+
+    def update(self):
+        """
+        Метод перерисовывает изменившиеся ячейки и шарики, делает очередной шаг анимаций и возвращает список
+        прямоугольников, изменившихся с прошлого кадра
+        """
+
+        # Прямоугольники кадров анимаций прошлого шага нужно обновить в любом случае: шарики оттуда ушли
+        rects = [frame_rect for _, _, frame_rect in self.frames]
+
+        # Делаем шаг анимаций. По их завершении в снимок попадают новые шарики - они отрисуются ниже
+        self.frames = []
+        for animation in self.animations:
+            surface, pos = animation.animate()
+            self.frames.append((surface, pos, self.pg.Rect(pos, surface.get_size())))
+        self.animations = list(filter(lambda val: val.has_animate(), self.animations))
+        rects.extend(frame_rect for _, _, frame_rect in self.frames)
+
+        # Отрисовываем гексы. Гексы не пересекаются, поэтому гекс просто рисуется поверх себя прежнего
+        for key in self.redraw_cell_keys:
+            cell_coord = self.cells_coord[key]
+            coords = cell_coord['coords']
+            color = self.CELL_BACKGROUND_COLOR
+
+            if key == self.key_cell_at_cursor:
+                color = self.CELL_AT_CURSOR_COLOR
+            if key in self.group:
+                color = self.CELL_GROUP_COLOR
+
+            self.pg.draw.polygon(self.cells_surface, color, coords)
+            self.pg.draw.polygon(self.cells_surface, self.CELL_BORDER_COLOR, coords, 1)
+            rects.append(cell_coord['rect'])
+
+        # Отрисовываем шарики. Прямоугольники шариков соседних ячеек не пересекаются
+        for key in self.redraw_ball_keys:
+            cell_coord = self.cells_coord[key]
+            self.balls_surface.fill(self.TRANSPARENT_COLOR, cell_coord['ball_rect'])
+
+            ball = self.get_content(key)
+            ball_surface = None
+            if ball == CMP_SIDE:
+                ball_surface = self.cmp_ball_surface
+            if ball == PLAYER_SIDE:
+                ball_surface = self.player_ball_surface
+
+            if ball_surface:
                 ball_w, ball_h = ball_surface.get_width(), ball_surface.get_height()
-                x, y = self.cells_coord[key]['x0'], self.cells_coord[key]['y0']
+                x, y = cell_coord['x0'], cell_coord['y0']
                 self.balls_surface.blit(ball_surface, (x - ball_w // 2, y - ball_h // 2))
+            rects.append(cell_coord['rect'])
 
-            if self.animations:
-                for animation in self.animations:
-                    animation.animate()
-                self.animations = list(filter(lambda val: val.has_animate(), self.animations))
+        self.redraw_cell_keys = set()
+        self.redraw_ball_keys = set()
+        return rects
 
-            self.redraw_balls_flag = False or len(self.animations) > 0
-
-            # Объединяем поверхности
+    def draw(self):
+        # Объединяем поверхности и накладываем кадры анимаций
         self.sc.blit(self.cells_surface, (0, 0))
         self.sc.blit(self.balls_surface, (0, 0))
+        for surface, pos, _ in self.frames:
+            self.sc.blit(surface, pos)
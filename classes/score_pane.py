@@ -22,7 +22,14 @@ class ScorePane:
             self.y_anchor = H - self.BORDER - 2 * self.SCORE_RADIUS
         self.x_anchor = W // 2 - (12 * self.SCORE_RADIUS + 5 * self.SCORE_MARGIN) // 2
 
-        self.surface = pg.Surface((W, H))
+        # Поверхность панели занимает только прямоугольник с кружками счета
+        self.rect = pg.Rect(
+            self.x_anchor,
+            self.y_anchor,
+            12 * self.SCORE_RADIUS + 5 * self.SCORE_MARGIN,
+            2 * self.SCORE_RADIUS
+        )
+        self.surface = pg.Surface(self.rect.size)
         self.surface.set_colorkey(self.TRANSPARENT_COLOR)
         self.surface.fill(self.TRANSPARENT_COLOR)
         self.refresh_flag = True
@@ -33,19 +40,25 @@ class ScorePane:
             self.score_count = next_score_count
             self.refresh_flag = True
 
-    def draw(self):
-        if self.refresh_flag:
-            self.surface.fill(self.TRANSPARENT_COLOR)
+    def update(self):
+        """ Метод перерисовывает панель, если счет изменился, и возвращает список изменившихся прямоугольников """
+
+        if not self.refresh_flag:
+            return []
 
-            x_center = self.x_anchor + self.SCORE_RADIUS
-            y_center = self.y_anchor + self.SCORE_RADIUS
-            for index in range(1, 7):
-                if index <= self.score_count:
-                    self.pg.draw.circle(self.surface, self.SCORE_COLOR, (x_center, y_center), self.SCORE_RADIUS)
+        self.surface.fill(self.TRANSPARENT_COLOR)
 
-                self.pg.draw.circle(self.surface, self.SCORE_BORDER_COLOR, (x_center, y_center), self.SCORE_RADIUS, 1)
-                x_center += (2 * self.SCORE_RADIUS + self.SCORE_MARGIN)
+        x_center = self.SCORE_RADIUS
+        y_center = self.SCORE_RADIUS
+        for index in range(1, 7):
+            if index <= self.score_count:
+                self.pg.draw.circle(self.surface, self.SCORE_COLOR, (x_center, y_center), self.SCORE_RADIUS)
 
-            self.refresh_flag = False
+            self.pg.draw.circle(self.surface, self.SCORE_BORDER_COLOR, (x_center, y_center), self.SCORE_RADIUS, 1)
+            x_center += (2 * self.SCORE_RADIUS + self.SCORE_MARGIN)
 
-        self.sc.blit(self.surface, (0, 0))
+        self.refresh_flag = False
+        return [self.rect]
+
+    def draw(self):
+        self.sc.blit(self.surface, self.rect)
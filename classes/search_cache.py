@@ -0,0 +1,143 @@
+import mmap
+import os
+import struct
+import tempfile
+import time
+from .pool import Pool
+from .paths import get_game_path
+
+
+class SearchCache:
+    """
+    Кэш результатов поиска, сохраняемый между запусками игры. Для каждой позиции, в которой компьютер искал ход,
+    хранится запись фиксированной длины: хэш позиции, оценка, глубина просчета, тип оценки, время записи и хэш позиции
+    после лучшего хода (как и в дебютной книге, ход хранится через хэш, а не через номер в списке ходов).
+    Файл отображается в память через mmap при первом обращении, записи ищутся двоичным поиском. Новые записи
+    копятся в памяти и сбрасываются в файл методом save. При переполнении из файла вытесняются сначала
+    самые мелкие, а из одинаково глубоких - самые старые записи. В заголовке файла, кроме версии формата, хранится
+    отпечаток весов оценки (Pool.RATING_KEY): кэш, заполненный при других весах, не используется и при сохранении
+    заменяется новыми записями
+    """
+
+    MAGIC = b'ABLNCACH'
+    VERSION = 3
+
+    # Метка формата, версия, отпечаток весов оценки, количество записей
+    HEADER_STRUCT = struct.Struct('<8sIII')
+
+    # Хэш позиции, оценка, глубина просчета, тип оценки, время записи, хэш позиции после лучшего хода
+    RECORD_STRUCT = struct.Struct('<QqhBxIQ')
+
+    def __init__(self, path, size_kb):
+        self.path = get_game_path(path)
+        self.max_records_count = max(1, (size_kb * 1024 - self.HEADER_STRUCT.size) // self.RECORD_STRUCT.size)
+
+        # Файл открывается при первом обращении к кэшу
+        self.data = None
+        self.records_count = 0
+        self.is_opened = False
+
+        # Записи, еще не сброшенные в файл: хэш позиции -> запись
+        self.new_records = {}
+
+    def _open(self):
+        self.is_opened = True
+        if not os.path.isfile(self.path) or os.path.getsize(self.path) < self.HEADER_STRUCT.size:
+            return
+
+        with open(self.path, 'rb') as file:
+            data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, rating_key, records_count = self.HEADER_STRUCT.unpack_from(data, 0)
+        if magic != self.MAGIC or version != self.VERSION or rating_key != Pool.RATING_KEY or \
+                len(data) != self.HEADER_STRUCT.size + records_count * self.RECORD_STRUCT.size:
+            data.close()
+            return
+
+        self.data = data
+        self.records_count = records_count
+
+    def _close(self):
+        if self.data:
+            self.data.close()
+        self.data = None
+        self.records_count = 0
+        self.is_opened = False
+
+    def _get_offset(self, index):
+        return self.HEADER_STRUCT.size + index * self.RECORD_STRUCT.size
+
+    def _find_record(self, key):
+        if not self.is_opened:
+            self._open()
+        if not self.data:
+            return None
+
+        low, high = 0, self.records_count
+        while low < high:
+            middle = (low + high) // 2
+            record = self.RECORD_STRUCT.unpack_from(self.data, self._get_offset(middle))
+            if record[0] == key:
+                return record
+            if record[0] < key:
+                low = middle + 1
+            else:
+                high = middle
+        return None
+
+    def get(self, key):
+        """
+        Метод возвращает кортеж (оценка, глубина, тип оценки, хэш позиции после лучшего хода)
+        или None, если записи нет
+        """
+
+        record = self.new_records.get(key) or self._find_record(key)
+        if not record:
+            return None
+        _, score, depth, flag, _, next_hash = record
+        return score, depth, flag, next_hash
+
+    def put(self, key, score, depth, flag, next_hash):
+        self.new_records[key] = (key, score, depth, flag, int(time.time()), next_hash)
+
+    @staticmethod
+    def _is_better(record, other):
+        # Из двух записей одной позиции остается более глубокая, а из одинаково глубоких - более новая
+        return (record[2], record[4]) > (other[2], other[4])
+
+    def save(self):
+        """ Метод сбрасывает новые записи в файл, вытесняя лишние """
+
+        if not self.new_records:
+            return
+
+        if not self.is_opened:
+            self._open()
+        records = {}
+        for index in range(self.records_count):
+            record = self.RECORD_STRUCT.unpack_from(self.data, self._get_offset(index))
+            records[record[0]] = record
+        for key, record in self.new_records.items():
+            if key not in records or self._is_better(record, records[key]):
+                records[key] = record
+
+        records = list(records.values())
+        if len(records) > self.max_records_count:
+            records.sort(key=lambda x: (x[2], x[4]), reverse=True)
+            del records[self.max_records_count:]
+        records.sort(key=lambda x: x[0])
+
+        # Файл записывается во временный и подменяет прежний только после закрытия отображения. Имя временного
+        # файла уникально, чтобы одновременно запущенные игры не писали в один и тот же файл
+        self._close()
+        with tempfile.NamedTemporaryFile(
+            'wb', dir=os.path.dirname(self.path), prefix=os.path.basename(self.path) + '.', suffix='.tmp', delete=False
+        ) as file:
+            file.write(self.HEADER_STRUCT.pack(self.MAGIC, self.VERSION, Pool.RATING_KEY, len(records)))
+            for record in records:
+                file.write(self.RECORD_STRUCT.pack(*record))
+        os.replace(file.name, self.path)
+        self.new_records = {}
+
+    def close(self):
+        self.save()
+        self._close()
@@ -0,0 +1,101 @@
+import atexit
+import multiprocessing
+from multiprocessing import shared_memory
+from settings import CMP_SIDE, TT_SIZE_MB
+from .pool import Pool
+from .transposition_table import TranspositionTable
+
+
+def helper_main(helper_index, memory_name, task_queue, search_id):
+    """
+    Цикл вспомогательного процесса поиска. Процесс получает из очереди позицию (в виде списка сделанных ходов)
+    и наибольшую глубину, ищет в ней ход компьютера и складывает результаты в общую таблицу транспозиций, пока номер
+    поиска не сменится. Ai создается один раз на процесс и только получает новую позицию для каждого поиска
+    """
+
+    from .ai import Ai
+
+    memory = shared_memory.SharedMemory(name=memory_name)
+    tt = TranspositionTable(TT_SIZE_MB, memory.buf)
+    ai = Ai(Pool(), tt=tt, helper_index=helper_index, search_time=None)
+    while True:
+        task = task_queue.get()
+        if task is None:
+            break
+
+        task_search_id, age, max_depth, actions = task
+        pool = Pool()
+        for action in actions:
+            pool.apply_action(action)
+        tt.age = age
+
+        ai.pool = pool
+        ai.max_depth = max_depth
+        ai.search(pool.create_actions(CMP_SIDE), lambda: search_id.value != task_search_id)
+
+    ai.close()
+    del ai, tt
+    memory.close()
+
+
+class SearchHelpers:
+    """
+    Вспомогательные процессы для параллельного поиска (Lazy SMP). Каждый процесс независимо ищет ход в той же позиции,
+    что и основной, но с другим порядком ходов и глубиной итераций. Общаются процессы только через таблицу
+    транспозиций в разделяемой памяти: найденные одними оценки и лучшие ходы сокращают перебор другим
+    """
+
+    def __init__(self, helpers_count):
+        self.helpers_count = helpers_count
+        self.memory = shared_memory.SharedMemory(create=True, size=TranspositionTable.get_buffer_size(TT_SIZE_MB))
+        self.tt = TranspositionTable(TT_SIZE_MB, self.memory.buf)
+        self.search_id = multiprocessing.Value('i', 0, lock=False)
+        self.task_queues = []
+        self.processes = []
+        atexit.register(self.close)
+
+    def start(self, actions, max_depth):
+        """
+        Метод запускает поиск хода во вспомогательных процессах. Позиция передается списком сделанных ходов.
+        Время поиска вспомогательных процессов не ограничено - их останавливает основной процесс (метод stop)
+        """
+
+        if not self.processes:
+            for helper_index in range(1, self.helpers_count + 1):
+                task_queue = multiprocessing.Queue()
+                process = multiprocessing.Process(
+                    target=helper_main,
+                    args=(helper_index, self.memory.name, task_queue, self.search_id),
+                    daemon=True
+                )
+                process.start()
+                self.task_queues.append(task_queue)
+                self.processes.append(process)
+
+        self.search_id.value += 1
+        for task_queue in self.task_queues:
+            task_queue.put((self.search_id.value, self.tt.age, max_depth, list(actions)))
+
+    def stop(self):
+        self.search_id.value += 1
+
+    def close(self):
+        if self.memory is None:
+            return
+
+        self.stop()
+        for task_queue in self.task_queues:
+            task_queue.put(None)
+        for process in self.processes:
+            process.join(1)
+            if process.is_alive():
+                process.terminate()
+
+        # Буфер может быть еще занят таблицей транспозиций поиска - тогда память освободится при завершении процесса
+        self.tt = None
+        try:
+            self.memory.close()
+        except BufferError:
+            pass
+        self.memory.unlink()
+        self.memory = None
@@ -0,0 +1,82 @@
+from time import time
+
+
+class SearchStats:
+    """
+    Статистика одного поиска хода. Заполняется объектом Ai во время поиска и доступна после него через атрибут
+    Ai.stats. Количество позиций считается так же, как total_view_position_count (оцененные позиции), а узлы
+    на уровнях дерева - по всем вызовам оценки хода (уровень 0 - ходы из исходной позиции)
+    """
+
+    def __init__(self, max_depth):
+        self.created = time()
+
+        # Глубина последней завершенной итерации (считая с 1) и общее время поиска в секундах
+        self.depth = 0
+        self.time = 0
+
+        # Оцененные позиции: всего и на каждой итерации итеративного углубления
+        self.view_position_count = 0
+        self.iteration_counts = []
+
+        # Узлы дерева перебора на каждом уровне (суммарно по всем итерациям)
+        self.ply_counts = [0] * (max_depth + 2)
+
+        # Отсечения: всего и на первом же просмотренном ходе узла (показатель качества упорядочивания ходов)
+        self.cutoff_count = 0
+        self.first_move_cutoff_count = 0
+
+        # Обращения к таблице транспозиций, попадания и отсечения по сохраненной оценке
+        self.tt_probe_count = 0
+        self.tt_hit_count = 0
+        self.tt_cut_count = 0
+
+        # Время на генерацию ходов и на оценку позиций в секундах
+        self.movegen_time = 0
+        self.eval_time = 0
+
+        # Время просчета каждого хода из исходной позиции в секундах (суммарно по всем итерациям)
+        self.root_times = {}
+
+    @property
+    def branching_factor(self):
+        """ Эффективный коэффициент ветвления - отношение количества позиций двух последних итераций """
+
+        counts = [count for count in self.iteration_counts if count]
+        if len(counts) < 2:
+            return None
+        return counts[-1] / counts[-2]
+
+    @property
+    def mcs_per_position(self):
+        if not self.view_position_count:
+            return None
+        return self.time * 1000000 / self.view_position_count
+
+    def to_dict(self):
+        branching_factor = self.branching_factor
+        mcs_per_position = self.mcs_per_position
+        ply_counts = list(self.ply_counts)
+        while len(ply_counts) > 1 and not ply_counts[-1]:
+            ply_counts.pop()
+        return {
+            'created': round(self.created, 3),
+            'depth': self.depth,
+            'time': round(self.time, 4),
+            'view_position_count': self.view_position_count,
+            'mcs_per_position': round(mcs_per_position, 2) if mcs_per_position is not None else None,
+            'iteration_counts': self.iteration_counts,
+            'ply_counts': ply_counts,
+            'branching_factor': round(branching_factor, 2) if branching_factor is not None else None,
+            'cutoff_count': self.cutoff_count,
+            'first_move_cutoff_count': self.first_move_cutoff_count,
+            'tt_probe_count': self.tt_probe_count,
+            'tt_hit_count': self.tt_hit_count,
+            'tt_cut_count': self.tt_cut_count,
+            'movegen_time': round(self.movegen_time, 4),
+            'eval_time': round(self.eval_time, 4),
+            'root_times': sorted(
+                ([action, round(seconds, 4)] for action, seconds in self.root_times.items()),
+                key=lambda x: x[1], reverse=True
+            )
+        }
@@ -0,0 +1,58 @@
+from settings import CMP_SIDE, PLAYER_SIDE
+
+
+class Snapshot:
+    """
+    Неизменяемый снимок расстановки шариков: доска каждой стороны в виде целого числа (как в пуле) и количество
+    шариков сторон. Снимок создается за O(1) и не содержит ссылок на изменяемые данные пула, поэтому его можно хранить
+    и передавать без копирования. Изменение ячейки возвращает новый снимок, исходный остается прежним.
+    Ячейки задаются битами (см. Pool.KEY_BITS)
+    """
+
+    __slots__ = ('cmp_board', 'player_board', 'cmp_balls_count', 'player_balls_count')
+
+    def __init__(self, cmp_board, player_board, cmp_balls_count, player_balls_count):
+        object.__setattr__(self, 'cmp_board', cmp_board)
+        object.__setattr__(self, 'player_board', player_board)
+        object.__setattr__(self, 'cmp_balls_count', cmp_balls_count)
+        object.__setattr__(self, 'player_balls_count', player_balls_count)
+
+    def __setattr__(self, name, value):
+        raise AttributeError('Снимок доски нельзя изменить')
+
+    def __eq__(self, other):
+        if not isinstance(other, Snapshot):
+            return NotImplemented
+        return self.cmp_board == other.cmp_board and self.player_board == other.player_board
+
+    def __hash__(self):
+        return hash((self.cmp_board, self.player_board))
+
+    def get_content(self, bit):
+        """ Метод возвращает сторону, шарик которой стоит в ячейке bit, или None, если ячейка пуста """
+
+        if self.cmp_board & bit:
+            return CMP_SIDE
+        if self.player_board & bit:
+            return PLAYER_SIDE
+        return None
+
+    def set_content(self, bit, side):
+        """ Метод возвращает снимок, в котором в ячейке bit стоит шарик стороны side (None - ячейка пуста) """
+
+        cmp_board, player_board = self.cmp_board, self.player_board
+        cmp_balls_count, player_balls_count = self.cmp_balls_count, self.player_balls_count
+        if cmp_board & bit:
+            cmp_board ^= bit
+            cmp_balls_count -= 1
+        if player_board & bit:
+            player_board ^= bit
+            player_balls_count -= 1
+
+        if side == CMP_SIDE:
+            cmp_board |= bit
+            cmp_balls_count += 1
+        if side == PLAYER_SIDE:
+            player_board |= bit
+            player_balls_count += 1
+        return Snapshot(cmp_board, player_board, cmp_balls_count, player_balls_count)
@@ -1,42 +1,55 @@
-from settings import W, H
-
-
 class ThinkPane:
     COLORS = [(192,) * 3, (128,) * 3, (105,) * 3, (80,) * 3]
     SQUARE_SIZE = 30
-    COORDS = [(10, 10), (10 + SQUARE_SIZE, 10), (10 + SQUARE_SIZE, 10 + SQUARE_SIZE), (10, 10 + SQUARE_SIZE)]
+    COORDS = [(0, 0), (SQUARE_SIZE, 0), (SQUARE_SIZE, SQUARE_SIZE), (0, SQUARE_SIZE)]
     ALPHA = 150
 
     def __init__(self, pg, sc):
         self.pg = pg
         self.sc = sc
-        self.surface = pg.Surface((W, H))
-        self.surface.set_colorkey((0,) * 3)
+        self.rect = pg.Rect(10, 10, self.SQUARE_SIZE * 2, self.SQUARE_SIZE * 2)
+        self.surface = pg.Surface(self.rect.size)
         self.surface.set_alpha(self.ALPHA)
         self.show_flag = False
         self.counter = 0
 
+        # Флаг необходимости перерисовки (панель показана, скрыта или ее цвета сдвинулись)
+        self.refresh_flag = False
+
     def show(self):
         self.show_flag = True
         self.counter = 0
+        self.refresh_flag = True
 
     def hide(self):
+        if self.show_flag:
+            self.refresh_flag = True
         self.show_flag = False
 
-    def draw(self):
-        if not self.show_flag:
-            return
+    def update(self):
+        """ Метод продвигает анимацию панели и возвращает список прямоугольников, изменившихся с прошлого кадра """
 
-        self.pg.draw.rect(self.surface, (0,) * 3, (10, 10, self.SQUARE_SIZE * 2, self.SQUARE_SIZE * 2))
+        if self.show_flag:
+            self.counter += 1
+            if self.counter == 5:
+                self.COLORS = [self.COLORS[-1]] + self.COLORS[:-1]
+                self.counter = 0
+                self.refresh_flag = True
 
-        color_index = 0
-        for x, y in self.COORDS:
-            self.pg.draw.rect(self.surface, self.COLORS[color_index], (x, y, self.SQUARE_SIZE, self.SQUARE_SIZE))
-            color_index += 1
+        if not self.refresh_flag:
+            return []
 
-        self.counter += 1
-        if self.counter == 5:
-            self.COLORS = [self.COLORS[-1]] + self.COLORS[:-1]
-            self.counter = 0
+        if self.show_flag:
+            color_index = 0
+            for x, y in self.COORDS:
+                self.pg.draw.rect(self.surface, self.COLORS[color_index], (x, y, self.SQUARE_SIZE, self.SQUARE_SIZE))
+                color_index += 1
+
+        self.refresh_flag = False
+        return [self.rect]
+
+    def draw(self):
+        if not self.show_flag:
+            return
 
-        self.sc.blit(self.surface, (0, 0))
+        self.sc.blit(self.surface, self.rect)
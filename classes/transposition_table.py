@@ -0,0 +1,94 @@
+import struct
+
+
+class TranspositionTable:
+    """
+    Таблица транспозиций фиксированного размера. Записи хранятся в упакованном виде в одном байтовом буфере,
+    индекс записи - младшие биты хэша позиции. Буфер может быть передан извне (например, разделяемая память
+    нескольких процессов поиска). Одновременная запись из разных процессов не блокируется: вместо хэша в записи
+    хранится его xor с остальными полями, поэтому запись, смешанная из двух разных, просто не найдется
+    """
+
+    EXACT = 0
+    LOWER = 1
+    UPPER = 2
+
+    # Хэш позиции, оценка, глубина просчета, тип оценки, номер поиска, лучший ход (0 - ход неизвестен)
+    ENTRY_STRUCT = struct.Struct('<QqhBBI')
+
+    KEY_MASK = 0xFFFFFFFFFFFFFFFF
+
+    def __init__(self, size_mb, buffer=None):
+        self.size = self.get_entries_count(size_mb)
+        self.mask = self.size - 1
+        self.buffer = buffer if buffer is not None else bytearray(self.get_buffer_size(size_mb))
+
+        # Номер текущего поиска. Записи предыдущих поисков вытесняются в первую очередь
+        self.age = 1
+
+        # Статистика обращений
+        self.probe_count = 0
+        self.hit_count = 0
+
+    @classmethod
+    def get_entries_count(cls, size_mb):
+        # Количество записей - наибольшая степень двойки, укладывающаяся в заданный объем памяти
+        result = 1
+        while result * 2 * cls.ENTRY_STRUCT.size <= size_mb * 1024 * 1024:
+            result *= 2
+        return result
+
+    @classmethod
+    def get_buffer_size(cls, size_mb):
+        return cls.get_entries_count(size_mb) * cls.ENTRY_STRUCT.size
+
+    @classmethod
+    def _get_check(cls, score, depth, flag, move):
+        return (score ^ (depth << 8 | flag) ^ (move << 32)) & cls.KEY_MASK
+
+    def clear(self):
+        """ Метод удаляет все записи. Буфер обнуляется на месте, так как он может находиться в разделяемой памяти """
+
+        self.buffer[:] = bytes(len(self.buffer))
+        self.age = 1
+
+    def new_search(self):
+        self.age = self.age % 255 + 1
+        self.probe_count = 0
+        self.hit_count = 0
+
+    def get(self, key):
+        """ Метод возвращает кортеж (оценка, глубина, тип оценки, лучший ход) или None, если записи нет """
+
+        self.probe_count += 1
+        entry_key, score, depth, flag, _, move = self.ENTRY_STRUCT.unpack_from(
+            self.buffer, (key & self.mask) * self.ENTRY_STRUCT.size
+        )
+        if entry_key ^ self._get_check(score, depth, flag, move) != key:
+            return None
+
+        self.hit_count += 1
+        return score, depth, flag, (move or None)
+
+    def put(self, key, score, depth, flag, move):
+        offset = (key & self.mask) * self.ENTRY_STRUCT.size
+        entry_key, entry_score, entry_depth, entry_flag, entry_age, entry_move = self.ENTRY_STRUCT.unpack_from(
+            self.buffer, offset
+        )
+        entry_key ^= self._get_check(entry_score, entry_depth, entry_flag, entry_move)
+
+        # Политика замещения: запись другой позиции, сделанная в текущем поиске на большую глубину, сохраняется
+        if entry_key != key and entry_age == self.age and entry_depth > depth:
+            return
+
+        if move is None:
+            move = entry_move if entry_key == key else 0
+        self.ENTRY_STRUCT.pack_into(
+            self.buffer, offset, key ^ self._get_check(score, depth, flag, move), score, depth, flag, self.age, move
+        )
+
+    @property
+    def hit_rate(self):
+        if not self.probe_count:
+            return 0
+        return self.hit_count / self.probe_count
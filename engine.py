@@ -0,0 +1,257 @@
+"""
+Движок без окна игры: текстовый протокол через стандартные ввод и вывод, по одной команде в строке. Позволяет
+управлять движком из внешних программ (турниров, скриптов анализа), запуская сколько угодно экземпляров.
+Импортирует только пул и Ai, pygame не требуется.
+
+Ходы записываются упакованными числами (см. Pool). Первым ходит игрок (PLAYER_SIDE), затем стороны чередуются.
+Оценка позиции в Ai считается за компьютер, поэтому ход за игрока ищется в зеркальной партии: доска отражается
+относительно центра, а стороны меняются местами.
+
+Команды:
+    position startpos [moves <ход> ...]  - начальная расстановка и (необязательно) сделанные из нее ходы
+    position <запись позиции>             - позиция в текстовой записи (см. Pool.format_actions)
+    play <ход> ...                        - сделать ходы в текущей позиции
+    moves                                 - вывести возможные ходы: moves <ход> ...
+    go [depth <N>] [time <секунды>] [nodes <N>] [infinite]
+                                          - искать ход; после каждой завершенной итерации выводится строка
+                                            info depth <N> score <оценка> nodes <N> time <мс> move <ход>,
+                                            в конце - bestmove <ход> (bestmove none, если ходить нельзя)
+    stop                                  - завершить поиск (ход выбирается по последней завершенной итерации)
+    isready                               - ответ readyok
+    quit                                  - выход
+Оценка в info - за сторону, которая ходит. Ошибки выводятся строкой error <описание>. Без ограничений в go
+действуют SEARCH_TIME и SEARCH_MAX_DEPTH. Дебютная книга и кэш поиска не используются.
+
+Пример:
+    printf "position startpos moves 6776\nmoves\n" | python engine.py
+"""
+
+import sys
+import threading
+import time
+from settings import CMP_SIDE, PLAYER_SIDE, SEARCH_TIME, SEARCH_MAX_DEPTH
+from classes.pool import Pool
+from classes.ai import Ai
+
+
+class EngineError(Exception):
+    pass
+
+
+class Engine:
+
+    def __init__(self, output):
+        self.output = output
+        self.output_lock = threading.Lock()
+
+        # Ходы, сделанные из начальной расстановки
+        self.actions = []
+
+        # Поиск идет в отдельном потоке, чтобы во время него можно было принимать команды
+        self.ai = None
+        self.finish_event = threading.Event()
+        self.max_nodes = None
+        self.search_thread = None
+        self.search_start = None
+        self.search_mirrored = None
+
+    def send(self, line):
+        with self.output_lock:
+            self.output.write(line + '\n')
+            self.output.flush()
+
+    def handle(self, line):
+        """ Метод выполняет команду line. Возвращает False, если работу нужно завершить """
+
+        words = line.split()
+        if not words:
+            return True
+        command, args = words[0], words[1:]
+
+        if command == 'quit':
+            self.stop()
+            return False
+        if command == 'isready':
+            self.send('readyok')
+            return True
+        if command == 'stop':
+            self.stop()
+            return True
+
+        # Остальные команды ждут завершения текущего поиска
+        self.wait()
+        try:
+            if command == 'position':
+                self.set_position(args)
+            elif command == 'play':
+                self.play(args)
+            elif command == 'moves':
+                self.send(' '.join(['moves'] + [str(action) for action in self.create_actions()]))
+            elif command == 'go':
+                self.go(args)
+            else:
+                raise EngineError('неизвестная команда {}'.format(command))
+        except EngineError as e:
+            self.send('error {}'.format(e))
+        return True
+
+    @property
+    def side(self):
+        """ Сторона, которая должна ходить в текущей позиции """
+
+        return PLAYER_SIDE if len(self.actions) % 2 == 0 else CMP_SIDE
+
+    def create_pool(self, mirrored=False):
+        """ Метод возвращает пул с текущей позицией (или зеркальной ей) """
+
+        return Pool.from_actions(self.actions, mirrored)
+
+    def create_actions(self):
+        pool = self.create_pool()
+        if pool.get_winner_side():
+            return []
+        return pool.create_actions(self.side)
+
+    def set_position(self, args):
+        if not args:
+            raise EngineError('ожидается position startpos [moves <ход> ...] или position <запись позиции>')
+
+        if args[0] == 'startpos':
+            if len(args) > 1 and args[1] != 'moves':
+                raise EngineError('ожидается moves после startpos')
+            moves = args[2:]
+        else:
+            try:
+                moves = [str(action) for action in Pool.parse_actions(args[0])]
+            except ValueError as e:
+                raise EngineError(str(e))
+
+        actions, self.actions = self.actions, []
+        try:
+            self.play(moves)
+        except EngineError:
+            self.actions = actions
+            raise
+
+    def play(self, args):
+        # Ходы применяются, только если все они возможны
+        pool = self.create_pool()
+        actions = list(self.actions)
+        for arg in args:
+            try:
+                action = int(arg)
+            except ValueError:
+                raise EngineError('неверная запись хода {}'.format(arg))
+            if pool.get_winner_side():
+                raise EngineError('партия окончена, ход {} невозможен'.format(arg))
+            side = PLAYER_SIDE if len(actions) % 2 == 0 else CMP_SIDE
+            if not 0 < action < Pool.ACTIONS_COUNT or Pool.ACTION_STEPS[action] is None \
+                    or not pool.is_action_possible(action, side):
+                raise EngineError('ход {} невозможен'.format(arg))
+            pool.apply_action(action)
+            actions.append(action)
+        self.actions = actions
+
+    def go(self, args):
+        search_time, max_depth, self.max_nodes = SEARCH_TIME, SEARCH_MAX_DEPTH, None
+        index = 0
+        try:
+            while index < len(args):
+                name = args[index]
+                if name == 'infinite':
+                    search_time, index = None, index + 1
+                elif name == 'depth':
+                    max_depth, index = int(args[index + 1]) - 1, index + 2
+                elif name == 'time':
+                    search_time, index = float(args[index + 1]), index + 2
+                elif name == 'nodes':
+                    self.max_nodes, index = int(args[index + 1]), index + 2
+                else:
+                    raise EngineError('неизвестный параметр go {}'.format(name))
+        except (IndexError, ValueError):
+            raise EngineError('неверные параметры go')
+        if max_depth < 0:
+            raise EngineError('глубина должна быть не меньше 1')
+
+        # Ai всегда ищет ход компьютера, поэтому за игрока поиск идет в зеркальной позиции. В зеркальной партии
+        # очередь хода не совпадает с четностью количества ходов, по которой она учитывается в хэше, поэтому
+        # при смене стороны Ai создается заново - с новой таблицей транспозиций
+        mirrored = self.side == PLAYER_SIDE
+        pool = self.create_pool(mirrored)
+        if pool.get_winner_side():
+            self.send('bestmove none')
+            return
+
+        if self.ai is None or mirrored != self.search_mirrored:
+            self.close_ai()
+            self.ai = Ai(pool, use_book=False, use_cache=False)
+            self.ai.finish_check = self._finish_check
+            self.ai.iteration_callback = self._send_info
+        self.search_mirrored = mirrored
+        self.ai.pool = pool
+        self.ai.search_time = search_time
+        self.ai.max_depth = max_depth
+        self.finish_event.clear()
+        self.search_start = time.perf_counter()
+        self.search_thread = threading.Thread(target=self._search, daemon=True)
+        self.search_thread.start()
+
+    def stop(self):
+        self.finish_event.set()
+        self.wait()
+
+    def wait(self):
+        if self.search_thread:
+            self.search_thread.join()
+            self.search_thread = None
+
+    def close(self):
+        self.stop()
+        self.close_ai()
+
+    def close_ai(self):
+        if self.ai:
+            self.ai.close()
+            self.ai = None
+
+    def _search(self):
+        rate_actions = self.ai.search(self.ai.pool.create_actions(CMP_SIDE))
+        if not rate_actions:
+            self.send('bestmove none')
+            return
+        self.send('bestmove {}'.format(self._get_action(rate_actions[0][1])))
+
+    def _finish_check(self):
+        if self.finish_event.is_set():
+            return True
+        return self.max_nodes is not None and self.ai.total_view_position_count >= self.max_nodes
+
+    def _send_info(self, depth, rate_actions):
+        rate, action = rate_actions[0]
+        self.send('info depth {} score {} nodes {} time {} move {}'.format(
+            depth,
+            rate,
+            self.ai.total_view_position_count,
+            int((time.perf_counter() - self.search_start) * 1000),
+            self._get_action(action)
+        ))
+
+    def _get_action(self, action):
+        # Ход из зеркальной позиции переводится обратно в ход текущей позиции
+        if not self.search_mirrored:
+            return action
+        return self.create_pool().mirror_action(action, CMP_SIDE)
+
+
+def main():
+    engine = Engine(sys.stdout)
+    try:
+        for line in sys.stdin:
+            if not engine.handle(line):
+                break
+    finally:
+        engine.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,264 @@
+"""
+Подсчет количества позиций (perft) на заданную глубину с помощью генератора ходов пула. Для каждого хода из исходной
+позиции выводится количество позиций в его поддереве, в конце - общее количество и скорость подсчета.
+В режиме проверки (--check) в каждой позиции ходы пула сверяются с простым эталонным генератором (ищутся
+пропущенные, лишние, повторяющиеся и неверно записанные ходы), после каждого применения и отката хода проверяется
+состояние пула, а результаты для начальной позиции сверяются с известными значениями. Pygame не требуется.
+
+Примеры запуска:
+    python perft.py 3
+    python perft.py 2 --check
+    python perft.py 2 --moves 30 --seed 5 --check
+"""
+
+import argparse
+import random
+import sys
+import time
+from settings import CMP_SIDE, PLAYER_SIDE
+from classes.pool import Pool
+
+# Известное количество позиций для начальной расстановки (ходит игрок)
+KNOWN_COUNTS = {1: 44, 2: 1936, 3: 98912}
+
+
+class PerftError(Exception):
+    pass
+
+
+def create_position(moves_count, seed):
+    """ Функция возвращает пул после moves_count случайных ходов и сторону, которая должна ходить """
+
+    generator = random.Random(seed)
+    pool = Pool()
+    side = PLAYER_SIDE
+    for _ in range(moves_count):
+        if pool.get_winner_side():
+            break
+        actions = sorted(pool.create_actions(side), key=lambda x: str(Pool.decode_action(x)))
+        pool.apply_action(generator.choice(actions))
+        side = Pool.OTHER_SIDE_DICT[side]
+    return pool, side
+
+
+def format_action(action):
+    """ Функция возвращает запись хода, заданного упакованным числом или кортежем пар ключей ячеек """
+
+    if isinstance(action, int):
+        action = Pool.decode_action(action)
+    return ' '.join(
+        '{}>{}'.format(','.join(map(str, old_key)), ','.join(map(str, next_key)) if next_key else 'x')
+        for old_key, next_key in action
+    )
+
+
+def create_reference_actions(cells, side):
+    """
+    Эталонный генератор ходов по правилам игры: перебираются все группы из одного-трех своих шариков на одной линии
+    и все направления. Работает со словарем ячеек и не использует таблиц пула, поэтому медленный, но независимый
+    """
+
+    other_side = Pool.OTHER_SIDE_DICT[side]
+    own_keys = [key for key, cell in cells.items() if cell['content'] == side]
+    result = []
+
+    for key in own_keys:
+        for direction in range(6):
+            n_key = cells[key]['around'][direction]
+            if n_key and not cells[n_key]['content']:
+                result.append(((key, n_key),))
+
+    for key in own_keys:
+        for axis in range(3):
+            group = [key]
+            for _ in range(2):
+                n_key = cells[group[-1]]['around'][axis]
+                if not n_key or cells[n_key]['content'] != side:
+                    break
+                group.append(n_key)
+
+                # Ход сдвига: каждый шарик группы перемещается в пустую соседнюю ячейку
+                for direction in range(6):
+                    if direction in (axis, axis + 3):
+                        continue
+                    next_keys = [cells[g_key]['around'][direction] for g_key in group]
+                    if all(next_keys) and not any(cells[n]['content'] for n in next_keys):
+                        result.append(tuple(zip(group, next_keys)))
+
+                # Линейный ход: группа движется вдоль своей линии и толкает меньшее количество шариков противника
+                for direction in (axis, axis + 3):
+                    line = group if direction == axis else group[::-1]
+                    pushed = []
+                    n_key = cells[line[-1]]['around'][direction]
+                    while n_key and cells[n_key]['content'] == other_side:
+                        pushed.append(n_key)
+                        n_key = cells[n_key]['around'][direction]
+                    if n_key and cells[n_key]['content'] == side:
+                        continue
+                    if len(pushed) >= len(group) or (not pushed and not n_key):
+                        continue
+
+                    # Первыми в ходе идут шарики, стоящие впереди по направлению движения
+                    chain = line + pushed
+                    result.append(tuple(
+                        (chain[index], cells[chain[index]]['around'][direction])
+                        for index in range(len(chain) - 1, -1, -1)
+                    ))
+
+    return result
+
+
+def get_state(pool):
+    return (
+        pool.cmp_board, pool.player_board, pool.cmp_balls_count, pool.player_balls_count,
+        list(pool.rates), pool.hash, len(pool.actions)
+    )
+
+
+def check_actions(pool, side, actions):
+    """ Функция сверяет ходы пула с эталонным генератором и возбуждает PerftError при расхождении """
+
+    position = ' '.join(format_action(action) for action in pool.actions) or 'начальная расстановка'
+
+    # Проверка возможности хода без генерации (ею пользуется поиск) должна давать те же ходы, что и генератор
+    possible = {
+        action for action, steps in enumerate(Pool.ACTION_STEPS) if steps and pool.is_action_possible(action, side)
+    }
+    if possible != set(actions):
+        raise PerftError('Проверка возможности хода расходится с генератором: {} (позиция: {})'.format(
+            '; '.join(map(format_action, sorted(possible ^ set(actions)))), position
+        ))
+
+    # Дальше ходы сравниваются в виде пар ключей ячеек - так же, как их формирует эталонный генератор
+    actions = [Pool.decode_action(action) for action in actions]
+    if len(set(actions)) != len(actions):
+        duplicates = sorted({action for action in actions if actions.count(action) > 1}, key=str)
+        raise PerftError('Повторяющиеся ходы: {} (позиция: {})'.format(
+            '; '.join(map(format_action, duplicates)), position
+        ))
+
+    reference_actions = create_reference_actions(pool.cells, side)
+    extra = set(actions) - set(reference_actions)
+    missing = set(reference_actions) - set(actions)
+
+    # Ход сдвига можно записать в любом порядке шариков, а в линейном ходе порядок важен
+    for action in list(extra):
+        for reference_action in missing:
+            if reference_action[0][1] == reference_action[1][0] or set(reference_action) != set(action):
+                continue
+            extra.remove(action)
+            missing.remove(reference_action)
+            break
+
+    if extra:
+        raise PerftError('Недопустимые ходы: {} (позиция: {})'.format(
+            '; '.join(map(format_action, sorted(extra, key=str))), position
+        ))
+    if missing:
+        raise PerftError('Пропущенные ходы: {} (позиция: {})'.format(
+            '; '.join(map(format_action, sorted(missing, key=str))), position
+        ))
+
+
+def check_apply(pool, action, cells_before, state_before):
+    """ Функция проверяет состояние пула после применения хода action """
+
+    expected = {key: cell['content'] for key, cell in cells_before.items()}
+    pairs = Pool.decode_action(action)
+    for old_key, _ in pairs:
+        expected[old_key] = None
+    for old_key, next_key in pairs:
+        if next_key:
+            expected[next_key] = cells_before[old_key]['content']
+    contents = {key: cell['content'] for key, cell in pool.cells.items()}
+
+    errors = []
+    if contents != expected:
+        errors.append('неверная расстановка шариков')
+    if pool.rates != pool._create_rates():
+        errors.append('неверные составляющие оценки')
+    if pool.hash != pool._create_hash():
+        errors.append('неверный хэш')
+    if pool.cmp_balls_count != list(expected.values()).count(CMP_SIDE) or \
+            pool.player_balls_count != list(expected.values()).count(PLAYER_SIDE):
+        errors.append('неверное количество шариков')
+    if len(pool.actions) != state_before[-1] + 1:
+        errors.append('неверный список ходов')
+    if errors:
+        raise PerftError('После хода {}: {}'.format(format_action(action), ', '.join(errors)))
+
+
+def perft(pool, side, depth, check=False, split=None):
+    """
+    Функция возвращает количество позиций на глубине depth. Если передан список split, то в него добавляются пары
+    (ход, количество позиций в его поддереве) для каждого хода из текущей позиции
+    """
+
+    if depth == 0:
+        return 1
+
+    actions = pool.create_actions(side)
+    if check:
+        check_actions(pool, side, actions)
+        cells_before = pool.cells
+        state_before = get_state(pool)
+
+    other_side = Pool.OTHER_SIDE_DICT[side]
+    result = 0
+    for action in actions:
+        pool.apply_action(action)
+        if check:
+            check_apply(pool, action, cells_before, state_before)
+
+        # Позиции, в которых партия уже закончилась, дальше не раскрываются
+        count = 0
+        if depth == 1:
+            count = 1
+        elif not pool.get_winner_side():
+            count = perft(pool, other_side, depth - 1, check)
+        result += count
+        if split is not None:
+            split.append((action, count))
+
+        pool.cancel_action()
+        if check and get_state(pool) != state_before:
+            raise PerftError('После отката хода {}: состояние пула не восстановлено'.format(format_action(action)))
+
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Подсчет количества позиций на заданную глубину')
+    parser.add_argument('depth', type=int, help='глубина подсчета')
+    parser.add_argument('--moves', type=int, default=0, help='количество случайных ходов до исходной позиции')
+    parser.add_argument('--seed', type=int, default=0, help='зерно для выбора случайных ходов')
+    parser.add_argument('--check', action='store_true', help='проверять ходы и состояние пула в каждой позиции')
+    args = parser.parse_args()
+
+    pool, side = create_position(args.moves, args.seed)
+    if pool.get_winner_side():
+        print('Партия в исходной позиции уже закончена')
+        return
+
+    split = []
+    time_start = time.perf_counter()
+    try:
+        total = perft(pool, side, args.depth, args.check, split)
+    except PerftError as error:
+        print(f'ОШИБКА: {error}')
+        sys.exit(1)
+    time_passed = time.perf_counter() - time_start
+
+    for action, count in split:
+        print(f'{format_action(action):<48} {count}')
+    print(f'Всего позиций: {total} время: {time_passed:.2f} с позиций в секунду: {round(total / time_passed)}')
+
+    # Количество позиций для начальной расстановки сверяется с известным
+    known_count = KNOWN_COUNTS.get(args.depth)
+    if args.check and not args.moves and known_count is not None and total != known_count:
+        print(f'ОШИБКА: ожидалось {known_count} позиций')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
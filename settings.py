@@ -1,3 +1,5 @@
+import os
+
 # Размеры и заголовок окна
 W, H = 1000, 860
 TITLE = 'Abalone'
@@ -19,10 +21,73 @@ CMP_MODE = 'cmp_mode'
 PLAYER_MODE = 'player_mode'
 END_MODE = 'end_mode'
 
-# Глубины расчета ходов
-LOW_DEPTH = 2
-MID_DEPTH = 3
-DEEP_DEPTH = 4
+# Частота кадров, пока экран меняется (идут анимации или расчет хода) или игрок двигает мышкой, и частота опроса
+# событий, когда экран неподвижен и событий нет. Реакция на первое событие после простоя - не дольше 1 / IDLE_FPS
+FPS = 30
+IDLE_FPS = 10
+
+# Время на расчет ответного хода в секундах. Компьютер просчитывает ходы на глубину 1, 2, 3..., пока не истечет это
+# время, и выбирает ход по результатам последней завершенной итерации. SEARCH_MAX_DEPTH - номер последней итерации
+# считая с 0 (как Ai.max_depth), то есть глубина просчета не больше SEARCH_MAX_DEPTH + 1
+SEARCH_TIME = 10
+SEARCH_MAX_DEPTH = 8
 
 # Флаг отладочного режима (в отладочном режиме в консоли IDE выводится основная информация о поиске ответного хода)
 DEBUG = False
+
+# Объем памяти под таблицу транспозиций в мегабайтах (0 - таблица не используется)
+TT_SIZE_MB = 16
+
+# Количество процессов, одновременно ищущих ответный ход (1 - поиск только в основном процессе).
+# Процессы обмениваются результатами через общую таблицу транспозиций, поэтому TT_SIZE_MB должен быть больше 0
+SEARCH_WORKERS = 1
+
+# Веса составляющих оценки позиции (см. Pool.get_rating): квадрат количества шариков, близость шариков к центру доски,
+# близость к стороне противника (множитель координаты a по этапам партии: до 21-го хода, с 21-го по 45-й и после 45-го),
+# прикрытия и квадрат количества выталкивающих ходов. Веса - целые числа, их можно подобрать скриптом tune.py.
+# Дебютная книга и кэш поиска, построенные при других весах, не используются (см. Pool.RATING_KEY)
+RATING_COUNT_WEIGHT = 1900
+RATING_DIST_WEIGHT = 1
+RATING_A_FACTORS = (8, 6, 2)
+RATING_COVER_WEIGHT = 1
+RATING_DROP_WEIGHT = 600
+
+# Файл профиля весов оценки (относительно каталога игры), который записывает tune.py с флагом --apply. Если файл есть,
+# заданные в нем веса заменяют указанные выше. Пустая строка - профиль не используется
+RATING_PROFILE_FILE = 'rating_profile.py'
+RATING_PROFILE_NAMES = ('RATING_COUNT_WEIGHT', 'RATING_DIST_WEIGHT', 'RATING_A_FACTORS', 'RATING_COVER_WEIGHT',
+                        'RATING_DROP_WEIGHT')
+RATING_PROFILE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), RATING_PROFILE_FILE)
+if RATING_PROFILE_FILE and os.path.isfile(RATING_PROFILE_PATH):
+    _profile = {}
+    with open(RATING_PROFILE_PATH, encoding='utf-8') as _file:
+        exec(_file.read(), _profile)
+    globals().update({name: _profile[name] for name in RATING_PROFILE_NAMES if name in _profile})
+
+# Флаг пакетной оценки позиций на последнем уровне перебора (требует numpy, без него флаг не действует)
+BATCH_LEAF_RATING = True
+
+# Файл дебютной книги (относительно каталога игры). Пустая строка - книга не используется. Книга строится
+# скриптом build_book.py и должна перестраиваться после изменений в оценке позиции или хэшировании (книга,
+# построенная при других весах оценки, не используется)
+OPENING_BOOK_FILE = 'opening_book.bin'
+
+# Файл кэша результатов поиска, сохраняемого между запусками игры (относительно каталога игры). Пустая строка - кэш
+# не используется. Размер файла ограничен SEARCH_CACHE_SIZE_KB: при переполнении вытесняются самые мелкие и самые
+# старые записи. Ход из кэша делается без поиска, если позиция была просчитана не менее чем на SEARCH_CACHE_MIN_DEPTH
+SEARCH_CACHE_FILE = 'search_cache.bin'
+SEARCH_CACHE_SIZE_KB = 1024
+SEARCH_CACHE_MIN_DEPTH = 4
+
+# Файл журнала статистики поиска (относительно каталога игры). После каждого поиска в него дописывается строка JSON
+# со статистикой (см. SearchStats): позиции по итерациям и уровням, отсечения, таблица транспозиций, время генерации
+# ходов и оценки, время просчета каждого хода. Пустая строка - журнал не ведется
+SEARCH_STATS_FILE = ''
+
+# Файл профиля (относительно каталога игры). Если задан, то первый поиск выполняется под cProfile и профиль
+# сохраняется в этот файл для просмотра модулем pstats. Пустая строка - профилирование выключено
+SEARCH_PROFILE_FILE = ''
+
+# Файл записей партий (относительно каталога игры, см. GameRecords). При выходе из игры сыгранная партия дописывается
+# в этот файл. Пустая строка - партии не записываются
+GAME_RECORDS_FILE = 'games.bin'
@@ -1,14 +1,16 @@
 import random
 import pygame as pg
-from settings import W, H, TITLE, COLOR_LABEL_1, COLOR_LABEL_2, CMP_SIDE, PLAYER_SIDE, CMP_MODE, PLAYER_MODE, END_MODE
+from settings import W, H, TITLE, COLOR_LABEL_1, COLOR_LABEL_2, CMP_SIDE, PLAYER_SIDE, CMP_MODE, PLAYER_MODE, \
+    END_MODE, FPS, IDLE_FPS, GAME_RECORDS_FILE
 from classes.background import Background
 from classes.pool import Pool
 from classes.pool_painter import PoolPainter
 from classes.group import Group
 from classes.score_pane import ScorePane
-from classes.ai import Ai
+from classes.engine_worker import EngineWorker
 from classes.msg_pane import MsgPane
 from classes.think_pane import ThinkPane
+from classes.game_records import GameRecords
 
 
 def main(cmp_color_label, player_color_label):
@@ -26,8 +28,10 @@ def main(cmp_color_label, player_color_label):
     player_score_pane = ScorePane(PLAYER_SIDE, pg, sc)
     mgs_pane = MsgPane(pg, sc)
     think_pane = ThinkPane(pg, sc)
-    ai = Ai(pool)
-    action_generator = None
+    engine = EngineWorker()
+
+    # Слои окна в порядке наложения
+    layers = [background, cmp_score_pane, player_score_pane, pool_painter, mgs_pane, think_pane]
 
     mode = PLAYER_MODE
 
@@ -64,33 +68,40 @@ def main(cmp_color_label, player_color_label):
 
     while True:
 
-        # Секция расчета и применения следующего хода
+        # Секция расчета и применения следующего хода. Ход рассчитывается в отдельном процессе,
+        # здесь только отправляется запрос и проверяется, готов ли ответ
         if not pool_painter.has_animate and mode == CMP_MODE:
-            if action_generator:
-                action = next(action_generator)
+            if engine.is_busy:
+                action = engine.poll()
                 if action:
                     apply_action(action, PLAYER_MODE, False)
-                    action_generator = None
                     think_pane.hide()
             else:
-                pool.backup_state()
-                action_generator = ai.action_generator()
+                engine.request(pool.actions)
                 think_pane.show()
 
         # Секция взаимодействия с пользователем
         events = pg.event.get()
         for event in events:
             if event.type == pg.QUIT:
+                if GAME_RECORDS_FILE and pool.actions:
+                    game_records = GameRecords(GAME_RECORDS_FILE)
+                    game_records.append(pool.actions, pool.get_winner_side())
+                    game_records.close()
+                engine.close()
                 pg.quit()
                 exit()
 
+            # Содержимое окна могло быть потеряно (например, при восстановлении свернутого окна)
+            if event.type == pg.VIDEOEXPOSE:
+                background.invalidate()
+
             if event.type == pg.MOUSEMOTION:
                 pool_painter.set_cursor_pos(event.pos)
 
             if not pool_painter.has_animate and event.type == pg.KEYDOWN and event.key == pg.K_SPACE:
                 if mode == CMP_MODE:
-                    pool.restore_state()
-                    action_generator = None
+                    engine.cancel()
                     think_pane.hide()
                 cancel_action()
 
@@ -105,15 +116,26 @@ def main(cmp_color_label, player_color_label):
                 action = group.create_action(event.pos)
                 apply_action(action, CMP_MODE, True)
 
-        # Секция команд отрисовки
-        background.draw()
-        cmp_score_pane.draw()
-        player_score_pane.draw()
-        pool_painter.draw()
-        mgs_pane.draw()
-        think_pane.draw()
-        pg.display.update()
-        clock.tick(30)
+        # Секция команд отрисовки. Каждый слой сообщает, какие прямоугольники в нем изменились, и только они
+        # перерисовываются (всеми слоями по порядку) и обновляются на экране
+        dirty_rects = []
+        for layer in layers:
+            dirty_rects.extend(layer.update())
+        if sc.get_rect() in dirty_rects:
+            dirty_rects = [sc.get_rect()]
+        for rect in dirty_rects:
+            sc.set_clip(rect)
+            for layer in layers:
+                layer.draw()
+        sc.set_clip(None)
+        if dirty_rects:
+            pg.display.update(dirty_rects)
+
+        # Пока идут анимации, расчет хода или приходят события, цикл работает с частотой FPS, а когда экран
+        # неподвижен - реже. pg.event.wait для ожидания не подходит: внутри pygame он опрашивает очередь событий
+        # каждую миллисекунду и нагружает процессор сильнее, чем редкие пустые кадры
+        is_idle = not (events or pool_painter.has_animate or pool_painter.has_frames or think_pane.show_flag)
+        clock.tick(IDLE_FPS if is_idle and mode != CMP_MODE else FPS)
 
 
 if __name__ == '__main__':
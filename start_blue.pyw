@@ -1,4 +1,6 @@
 from settings import COLOR_LABEL_1, COLOR_LABEL_2
 from start import main
 
-main(cmp_color_label=COLOR_LABEL_1, player_color_label=COLOR_LABEL_2)
+# Расчет ходов идет в отдельном процессе, поэтому игра запускается только из главного модуля
+if __name__ == '__main__':
+    main(cmp_color_label=COLOR_LABEL_1, player_color_label=COLOR_LABEL_2)
@@ -0,0 +1,317 @@
+"""
+Подбор весов оценки позиции (см. Pool.get_rating и RATING_* в settings.py) по записям партий (см. GameRecords).
+
+Из каждой позиции партий, закончившихся победой одной из сторон, один раз извлекаются исходные составляющие оценки
+обеих сторон: количество шариков, расстояния, сумма координат a, прикрытия, выталкивающие ходы и номер хода. Из них
+одной операцией над всем массивом строится матрица признаков, в которой оценка позиции - произведение строки на вектор
+весов. Затем подбирается масштаб сигмоиды, при котором текущие веса лучше всего предсказывают итог партии (1 - победа
+компьютера, 0 - победа игрока), и при этом масштабе веса подбираются градиентным спуском (Adam) по средней квадратичной
+ошибке предсказания. Каждая десятая партия в подборе не участвует - ошибка на ней показывает, не подогнаны ли веса
+под конкретные партии. Результат - профиль настроек: строки RATING_* с целыми весами. С флагом --apply профиль
+записывается в файл RATING_PROFILE_FILE, и игра и все скрипты используют подобранные веса вместо указанных
+в settings.py (чтобы вернуться к ним, файл профиля нужно удалить). Дебютная книга и кэш поиска, построенные при других
+весах, не используются - книгу после этого нужно перестроить (build_book.py).
+
+Исходные составляющие можно сохранить в файл (--features): при следующем запуске с теми же партиями (размер и время
+изменения файла партий не изменились) они читаются из него. С флагом --selfplay перед подбором в файл партий
+дописываются партии компьютера с самим собой: первые --random-moves ходов случайные, далее ходы ищутся на глубину
+--depth.
+
+Требуется numpy. Pygame не требуется.
+
+Примеры запуска:
+    python tune.py games.bin --selfplay 200 --depth 2
+    python tune.py games.bin --features features.npz --apply
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from array import array
+from settings import CMP_SIDE, PLAYER_SIDE, RATING_COUNT_WEIGHT, RATING_DIST_WEIGHT, RATING_A_FACTORS, \
+    RATING_COVER_WEIGHT, RATING_DROP_WEIGHT, RATING_PROFILE_FILE, RATING_PROFILE_PATH
+from classes.pool import Pool
+from classes.ai import Ai
+from classes.game_records import GameRecords
+
+try:
+    import numpy as np
+except ImportError:
+    sys.exit('Для подбора весов нужна библиотека numpy')
+
+# Исходные составляющие позиции: количество шариков сторон, номер хода и Pool.rates (в том же порядке)
+RAW_COLUMNS = [
+    'cmp_count', 'player_count', 'actions_count', 'cmp_dist', 'player_dist', 'cmp_a_sum', 'player_a_sum',
+    'cmp_cover', 'player_cover', 'cmp_drop', 'player_drop'
+]
+RAW = {name: index for index, name in enumerate(RAW_COLUMNS)}
+
+# Веса в порядке столбцов матрицы признаков
+WEIGHT_NAMES = [
+    'RATING_COUNT_WEIGHT', 'RATING_DIST_WEIGHT', 'RATING_A_FACTORS[0]', 'RATING_A_FACTORS[1]', 'RATING_A_FACTORS[2]',
+    'RATING_COVER_WEIGHT', 'RATING_DROP_WEIGHT'
+]
+
+# Каждая VALIDATION_STEP-я партия не участвует в подборе весов
+VALIDATION_STEP = 10
+
+# Партия компьютера с самим собой прекращается после SELFPLAY_MAX_MOVES ходов. Победа в ней присуждается стороне,
+# у которой осталось больше шариков, а при равенстве партия считается незаконченной и для подбора не используется
+SELFPLAY_MAX_MOVES = 300
+
+# Параметры градиентного спуска (шаг - в единицах логита сигмоиды на стандартное отклонение признака)
+LEARNING_RATE = 0.02
+ADAM_BETAS = (0.9, 0.999)
+
+
+def get_current_weights():
+    return np.array([
+        RATING_COUNT_WEIGHT, RATING_DIST_WEIGHT, *RATING_A_FACTORS, RATING_COVER_WEIGHT, RATING_DROP_WEIGHT
+    ], dtype=np.float64)
+
+
+def play_games(path, count, depth, random_moves, seed):
+    """
+    Функция дописывает в файл path count партий компьютера с самим собой. Ai всегда ищет ход компьютера, поэтому
+    за игрока ходы ищутся в зеркальной партии, которая ведется параллельно основной (см. Pool.mirror_action)
+    """
+
+    generator = random.Random(seed)
+    ais = {}
+    for side in (CMP_SIDE, PLAYER_SIDE):
+        ais[side] = Ai(Pool(), workers=1, use_book=False, use_cache=False, search_time=None, max_depth=depth - 1)
+
+    game_records = GameRecords(path)
+    time_start = time.perf_counter()
+    for game_number in range(1, count + 1):
+        pool = Pool()
+        mirror_pool = Pool()
+        ais[CMP_SIDE].pool = pool
+        ais[PLAYER_SIDE].pool = mirror_pool
+        side = PLAYER_SIDE
+        while len(pool.actions) < SELFPLAY_MAX_MOVES and not pool.get_winner_side():
+            if len(pool.actions) < random_moves:
+                action = generator.choice(pool.create_actions(side))
+            else:
+                search_pool = pool if side == CMP_SIDE else mirror_pool
+                rate_actions = ais[side].search(search_pool.create_actions(CMP_SIDE))
+                action = generator.choice([action for rate, action in rate_actions if rate == rate_actions[0][0]])
+                if side == PLAYER_SIDE:
+                    action = pool.mirror_action(action, CMP_SIDE)
+
+            mirror_action = mirror_pool.mirror_action(action, side)
+            pool.apply_action(action)
+            mirror_pool.apply_action(mirror_action)
+            side = Pool.OTHER_SIDE_DICT[side]
+
+        winner = pool.get_winner_side()
+        if not winner and pool.cmp_balls_count != pool.player_balls_count:
+            winner = CMP_SIDE if pool.cmp_balls_count > pool.player_balls_count else PLAYER_SIDE
+        game_records.append(pool.actions, winner)
+        print(f'Партия {game_number} из {count}: ходов {len(pool.actions)}, победитель {winner or "нет"}, '
+              f'время {time.perf_counter() - time_start:.0f} с')
+
+    game_records.close()
+    for ai in ais.values():
+        ai.close()
+
+
+def extract_raw(path):
+    """
+    Функция возвращает исходные составляющие всех позиций законченных партий из файла path: матрицу (позиция x
+    RAW_COLUMNS), итог партии для каждой позиции (1 - победа компьютера, 0 - победа игрока) и номер партии
+    """
+
+    raw = array('i')
+    results = array('b')
+    game_numbers = array('i')
+    for game_number, (moves, winner) in enumerate(GameRecords.read(path)):
+        if winner is None:
+            continue
+        pool = Pool()
+        for action in moves:
+            pool.apply_action(action)
+            raw.append(pool.cmp_balls_count)
+            raw.append(pool.player_balls_count)
+            raw.append(len(pool.actions))
+            raw.extend(pool.rates)
+        results.extend([1 if winner == CMP_SIDE else 0] * len(moves))
+        game_numbers.extend([game_number] * len(moves))
+
+    raw = np.frombuffer(raw, dtype=np.int32).reshape(-1, len(RAW_COLUMNS))
+    return raw, np.frombuffer(results, dtype=np.int8), np.frombuffer(game_numbers, dtype=np.int32)
+
+
+def load_raw(games_path, features_path):
+    """
+    Функция возвращает исходные составляющие из файла features_path, а если он устарел - извлекает их заново.
+    Файл считается устаревшим, если у файла партий изменились размер или время изменения
+    """
+
+    games_stat = os.stat(games_path)
+    games_key = np.array([games_stat.st_size, games_stat.st_mtime_ns], dtype=np.int64)
+    if features_path and os.path.exists(features_path):
+        data = np.load(features_path)
+        if 'games_key' in data and np.array_equal(data['games_key'], games_key):
+            return data['raw'], data['results'], data['game_numbers']
+
+    raw, results, game_numbers = extract_raw(games_path)
+    if features_path:
+        with open(features_path, 'wb') as file:
+            np.savez(file, raw=raw, results=results, game_numbers=game_numbers, games_key=games_key)
+    return raw, results, game_numbers
+
+
+def create_features(raw):
+    """
+    Функция возвращает матрицу признаков (позиция x WEIGHT_NAMES): оценка позиции по get_rating равна произведению
+    строки матрицы на вектор весов. Множитель координаты a у каждого этапа партии свой, поэтому сумма a попадает
+    в столбец своего этапа, а в столбцах других этапов - нули
+    """
+
+    def column(name):
+        return raw[:, RAW[name]].astype(np.float64)
+
+    actions_count = raw[:, RAW['actions_count']]
+    a_sums = -(column('cmp_a_sum') + column('player_a_sum'))
+    phases = [actions_count < 21, (actions_count >= 21) & (actions_count <= 45), actions_count > 45]
+    return np.column_stack([
+        column('cmp_count') ** 2 - column('player_count') ** 2,
+        column('cmp_dist') - column('player_dist'),
+        *[np.where(phase, a_sums, 0) for phase in phases],
+        column('cmp_cover') - column('player_cover'),
+        column('cmp_drop') ** 2 - column('player_drop') ** 2
+    ])
+
+
+def sigmoid(x):
+    return 0.5 * (1 + np.tanh(0.5 * x))
+
+
+def get_error(features, results, weights, scale):
+    return float(np.mean((sigmoid(features @ weights * scale) - results) ** 2))
+
+
+def fit_scale(features, results, weights):
+    """ Функция подбирает масштаб сигмоиды для весов weights (поиск золотым сечением по логарифму масштаба) """
+
+    ratings = features @ weights
+    low, high = -8.0, 0.0
+    ratio = (5 ** 0.5 - 1) / 2
+    for _ in range(60):
+        left = high - (high - low) * ratio
+        right = low + (high - low) * ratio
+        left_error = np.mean((sigmoid(ratings * 10 ** left) - results) ** 2)
+        right_error = np.mean((sigmoid(ratings * 10 ** right) - results) ** 2)
+        if left_error < right_error:
+            high = right
+        else:
+            low = left
+    return 10 ** ((low + high) / 2)
+
+
+def fit_weights(features, results, weights, scale, iterations):
+    """
+    Функция подбирает веса градиентным спуском (Adam). Спуск идет по нормированным весам - вкладам признаков
+    в логит сигмоиды в расчете на стандартное отклонение признака: иначе шаги по весам, отличающимся на три
+    порядка (количество шариков и расстояния), пришлось бы подбирать отдельно
+    """
+
+    deviations = features.std(axis=0)
+    deviations[deviations == 0] = 1
+    normed = features / deviations
+    params = weights * scale * deviations
+
+    moments = np.zeros_like(params)
+    squares = np.zeros_like(params)
+    beta_1, beta_2 = ADAM_BETAS
+    for iteration in range(1, iterations + 1):
+        predictions = sigmoid(normed @ params)
+        errors = (predictions - results) * predictions * (1 - predictions)
+        gradient = normed.T @ errors * (2 / len(results))
+
+        moments = beta_1 * moments + (1 - beta_1) * gradient
+        squares = beta_2 * squares + (1 - beta_2) * gradient ** 2
+        step = moments / (1 - beta_1 ** iteration) / (np.sqrt(squares / (1 - beta_2 ** iteration)) + 1e-12)
+        params -= LEARNING_RATE * step
+
+    return params / scale / deviations
+
+
+def format_profile(weights, comment):
+    count_weight, dist_weight, a_1, a_2, a_3, cover_weight, drop_weight = (int(weight) for weight in weights)
+    return (
+        f'# {comment}\n'
+        f'RATING_COUNT_WEIGHT = {count_weight}\n'
+        f'RATING_DIST_WEIGHT = {dist_weight}\n'
+        f'RATING_A_FACTORS = ({a_1}, {a_2}, {a_3})\n'
+        f'RATING_COVER_WEIGHT = {cover_weight}\n'
+        f'RATING_DROP_WEIGHT = {drop_weight}\n'
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Подбор весов оценки позиции по записям партий')
+    parser.add_argument('games', help='файл записей партий')
+    parser.add_argument('--features', help='файл для сохранения исходных составляющих позиций (.npz)')
+    parser.add_argument('--output', help='файл профиля настроек с подобранными весами')
+    parser.add_argument('--apply', action='store_true', help='записать профиль в RATING_PROFILE_FILE (веса для игры)')
+    parser.add_argument('--iterations', type=int, default=1000, help='количество шагов градиентного спуска')
+    parser.add_argument('--selfplay', type=int, default=0, help='сколько партий компьютера с самим собой дописать')
+    parser.add_argument('--depth', type=int, default=2, help='глубина поиска в партиях компьютера с самим собой')
+    parser.add_argument('--random-moves', type=int, default=6, help='количество первых случайных ходов партии')
+    parser.add_argument('--seed', type=int, default=0, help='зерно для случайных ходов')
+    args = parser.parse_args()
+    if args.apply and not RATING_PROFILE_FILE:
+        parser.error('в settings.py не задан RATING_PROFILE_FILE')
+
+    if args.selfplay:
+        play_games(args.games, args.selfplay, args.depth, args.random_moves, args.seed)
+
+    time_start = time.perf_counter()
+    raw, results, game_numbers = load_raw(args.games, args.features)
+    features = create_features(raw)
+    results = results.astype(np.float64)
+    print(f'Позиций {len(results)} из {len(np.unique(game_numbers))} партий, '
+          f'время подготовки {time.perf_counter() - time_start:.1f} с')
+    if not len(results):
+        sys.exit('В файле нет законченных партий')
+
+    is_validation = game_numbers % VALIDATION_STEP == 0
+    train_features, train_results = features[~is_validation], results[~is_validation]
+    valid_features, valid_results = features[is_validation], results[is_validation]
+
+    current_weights = get_current_weights()
+    scale = fit_scale(train_features, train_results, current_weights)
+    time_start = time.perf_counter()
+    weights = np.round(fit_weights(train_features, train_results, current_weights, scale, args.iterations))
+    time_passed = time.perf_counter() - time_start
+    print(f'Масштаб сигмоиды {scale:.3g}, спуск {time_passed:.1f} с '
+          f'({len(train_results) * args.iterations / max(time_passed, 0.001) / 1000000:.0f} млн позиций/с)')
+
+    errors = []
+    for name, subset_features, subset_results in (
+        ('подбор', train_features, train_results), ('проверка', valid_features, valid_results)
+    ):
+        if not len(subset_results):
+            continue
+        current_error = get_error(subset_features, subset_results, current_weights, scale)
+        error = get_error(subset_features, subset_results, weights, scale)
+        errors.append(f'{name} {current_error:.5f} -> {error:.5f}')
+        print(f'Ошибка ({name}, позиций {len(subset_results)}): {current_error:.5f} -> {error:.5f}')
+    for name, current_weight, weight in zip(WEIGHT_NAMES, current_weights, weights):
+        print(f'{name:>20}: {current_weight:>8.0f} -> {weight:>8.0f}')
+
+    profile = format_profile(weights, f'Веса подобраны tune.py по {len(results)} позициям ({", ".join(errors)})')
+    print(profile, end='')
+    for path in (args.output, RATING_PROFILE_PATH if args.apply else None):
+        if path:
+            with open(path, 'w', encoding='utf-8') as file:
+                file.write(profile)
+            print(f'Профиль записан в {path}')
+
+
+if __name__ == '__main__':
+    main()